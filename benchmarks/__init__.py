@@ -0,0 +1 @@
+"""Benchmarks of the IPPcode23 interpreter (interpret.py)"""
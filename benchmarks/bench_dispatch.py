@@ -0,0 +1,29 @@
+"""Measures instruction dispatch throughput (steps/second) of interpret.py
+
+usage: python -m benchmarks.bench_dispatch [--iterations N] [--repeat R] [interpret.py ...]
+
+Every given interpreter runs the same tight arithmetic loop, so comparing two versions
+of interpret.py (e.g. a checkout of an older commit) shows the difference in dispatch cost.
+"""
+import tempfile
+
+from benchmarks.programs import assemble, counting_loop
+from benchmarks.suite import arguments, best, write_source
+
+
+def main():
+    parser = arguments('bench_dispatch', 'dispatch throughput of interpret.py')
+    parser.add_argument('--iterations', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    source, steps = counting_loop(args.iterations)
+    with tempfile.TemporaryDirectory() as directory:
+        source_file = write_source(directory, 'loop', assemble(source))
+        for interpreter in args.interpreters:
+            elapsed, _, code = best(interpreter, source_file, args.repeat)
+            print(f"{interpreter}: {steps} steps in {elapsed:.3f} s, {steps / elapsed:,.0f} steps/s, rc {code}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""Measures program loading time of interpret.py for growing program sizes
+
+usage: python -m benchmarks.bench_loader [--sizes 10000 100000 1000000] [--timeout S] [interpret.py ...]
+
+The generated programs end right after their first instruction, so the measured time is
+almost only parsing, checking and ordering of the instructions. Linear-ish loading shows
+as a roughly constant time per instruction across the sizes.
+"""
+import tempfile
+
+from benchmarks.programs import straight_line
+from benchmarks.suite import arguments, measure, write_source
+
+
+def main():
+    parser = arguments('bench_loader', 'loading time of interpret.py')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--timeout', type=float, default=600)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            source_file = write_source(directory, f'straight_{size}', straight_line(size))
+            for interpreter in args.interpreters:
+                run = measure(interpreter, source_file, timeout=args.timeout)
+                if run is None:
+                    print(f"{interpreter}: {size} instructions, timeout after {args.timeout:.0f} s")
+                else:
+                    print(f"{interpreter}: {size} instructions in {run[0]:.3f} s, "
+                          f"{run[0] / size * 1e6:.2f} us/instruction")
+
+
+if __name__ == '__main__':
+    main()
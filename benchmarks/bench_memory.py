@@ -0,0 +1,32 @@
+"""Reports memory used per loaded instruction by interpret.py
+
+usage: python -m benchmarks.bench_memory [--sizes 100000 300000] [interpret.py ...]
+
+Peak RSS of the interpreter is measured for straight-line programs of different sizes
+(only their first instruction, EXIT, is executed). The slope between the sizes is the
+number of bytes the loaded program takes per instruction, independent of the constant
+cost of starting python.
+"""
+import tempfile
+
+from benchmarks.programs import straight_line
+from benchmarks.suite import arguments, measure, write_source
+
+
+def main():
+    parser = arguments('bench_memory', 'memory per instruction of interpret.py')
+    parser.add_argument('--sizes', type=int, nargs=2, default=[100000, 300000])
+    args = parser.parse_args()
+
+    small, large = args.sizes
+    with tempfile.TemporaryDirectory() as directory:
+        files = {size: write_source(directory, f'straight_{size}', straight_line(size)) for size in (small, large)}
+        for interpreter in args.interpreters:
+            rss = {size: measure(interpreter, files[size])[1] for size in (small, large)}
+            per_instruction = (rss[large] - rss[small]) / (large - small)
+            print(f"{interpreter}: peak RSS {rss[small] / 2 ** 20:.0f} MiB ({small}), "
+                  f"{rss[large] / 2 ** 20:.0f} MiB ({large}), {per_instruction:.0f} bytes/instruction")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Measures WRITE throughput of interpret.py
+
+usage: python -m benchmarks.bench_output [--count N] [--repeat R] [interpret.py ...]
+
+The program writes N numbers on separate lines. The output goes to a file, and the
+outputs of all given interpreters are compared, so a faster version can be checked
+to produce exactly the same bytes.
+"""
+import hashlib
+import os
+import sys
+import tempfile
+
+from benchmarks.programs import assemble, write_heavy
+from benchmarks.suite import arguments, measure, write_source
+
+
+def run(interpreter, source_file, output_file, repeat):
+    """runs interpreter repeat times with stdout in output_file, returns the best wall time and digest of stdout"""
+    times = []
+    for _ in range(repeat):
+        with open(output_file, 'wb') as out:
+            times.append(measure(interpreter, source_file, stdout=out)[0])
+
+    with open(output_file, 'rb') as out:
+        data = out.read()
+    return min(times), len(data), hashlib.sha256(data).hexdigest()
+
+
+def main():
+    parser = arguments('bench_output', 'WRITE throughput of interpret.py')
+    parser.add_argument('--count', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    source, steps = write_heavy(args.count)
+    digests = set()
+    with tempfile.TemporaryDirectory() as directory:
+        source_file = write_source(directory, 'write', assemble(source))
+        for interpreter in args.interpreters:
+            elapsed, size, digest = run(interpreter, source_file, os.path.join(directory, 'out'), args.repeat)
+            digests.add(digest)
+            print(f"{interpreter}: {size} bytes in {elapsed:.3f} s, {size / elapsed / 2 ** 20:.2f} MiB/s, "
+                  f"{steps / elapsed:,.0f} steps/s, sha256 {digest[:16]}")
+
+    if len(digests) > 1:
+        print("outputs differ")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Stress benchmark of the data stack, the call stack and the local frame stack of interpret.py
+
+usage: python -m benchmarks.bench_stacks [--pushes N] [--calls N] [--timeout S] [interpret.py ...]
+
+With stacks growing at their front every push and pop is O(depth), so the run time of
+these programs grows quadratically with N; with O(1) stacks it stays linear.
+"""
+import tempfile
+
+from benchmarks.programs import assemble, deep_recursion, stack_fill
+from benchmarks.suite import arguments, measure, write_source
+
+
+def main():
+    parser = arguments('bench_stacks', 'stack stress test of interpret.py')
+    parser.add_argument('--pushes', type=int, default=1000000)
+    parser.add_argument('--calls', type=int, default=100000)
+    parser.add_argument('--timeout', type=float, default=600)
+    args = parser.parse_args()
+
+    workloads = [(f'PUSHS/POPS {args.pushes} deep', stack_fill(args.pushes)),
+                 (f'CALL/RETURN {args.calls} deep', deep_recursion(args.calls))]
+    with tempfile.TemporaryDirectory() as directory:
+        for number, (name, (source, steps)) in enumerate(workloads):
+            source_file = write_source(directory, f'stacks_{number}', assemble(source))
+            for interpreter in args.interpreters:
+                run = measure(interpreter, source_file, timeout=args.timeout)
+                if run is None:
+                    print(f"{interpreter}: {name}, timeout after {args.timeout:.0f} s")
+                else:
+                    print(f"{interpreter}: {name}, {steps} steps in {run[0]:.3f} s, "
+                          f"{steps / run[0]:,.0f} steps/s")
+
+
+if __name__ == '__main__':
+    main()
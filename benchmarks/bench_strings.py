@@ -0,0 +1,34 @@
+"""Scaling benchmark of CONCAT appending to a variable and SETCHAR on a long string
+
+usage: python -m benchmarks.bench_strings [--lengths N ...] [--timeout S] [interpret.py ...]
+
+When every CONCAT and SETCHAR copies the whole string, the run time grows quadratically
+with the length of the string; with a string buffer changed in place it stays linear.
+"""
+import tempfile
+
+from benchmarks.programs import assemble, string_building
+from benchmarks.suite import arguments, measure, write_source
+
+
+def main():
+    parser = arguments('bench_strings', 'string building test of interpret.py')
+    parser.add_argument('--lengths', type=int, nargs='+', default=[10000, 100000, 500000])
+    parser.add_argument('--timeout', type=float, default=600)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for length in args.lengths:
+            source, steps = string_building(length)
+            source_file = write_source(directory, f'strings_{length}', assemble(source))
+            for interpreter in args.interpreters:
+                run = measure(interpreter, source_file, timeout=args.timeout)
+                if run is None:
+                    print(f"{interpreter}: {length} characters, timeout after {args.timeout:.0f} s")
+                else:
+                    print(f"{interpreter}: {length} characters, {steps} steps in {run[0]:.3f} s, "
+                          f"{run[0] / length * 1e6:.2f} us/character")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Differential check of the optimizing configurations of interpret.py on generated programs
+
+usage: python -m benchmarks.differential [--count N] [--seed S] [--jobs J] [--keep DIR]
+
+Every program generated by programs.random_program is interpreted in-process plain (without
+optimizations and JIT), optimized with every block compiled at its first entry (JIT threshold 1)
+and with the default JIT threshold (100). Stdout and exit code of the optimized runs have to be
+the same as of the plain run. Failing programs are written to --keep as <seed>.src and <seed>.in,
+so they can be run by interpret.py --test. Exits with 1 when any program differs.
+"""
+import argparse
+import concurrent.futures
+import io
+import os
+import sys
+
+from benchmarks.programs import assemble, random_program
+from benchmarks.suite import ROOT
+
+sys.path.insert(0, ROOT)
+
+import interpret  # noqa: E402
+
+CONFIGURATIONS = {
+    'plain': {'optimize': False, 'jit': 0},
+    'jit 1': {'optimize': True, 'jit': 1},
+    'jit 100': {'optimize': True, 'jit': 100},
+}
+
+
+def run(source, text, options):
+    """interprets the program in-process, returns (stdout, exit code), a crash of the interpreter as exit code"""
+    stdout = io.StringIO()
+    try:
+        code = interpret.run(source, text.splitlines(), stdout=stdout, stderr=io.StringIO(), **options)
+    except Exception as error:  # failure of the interpreter itself, not of the program
+        code = f"{type(error).__name__}: {error}"
+    return stdout.getvalue(), code
+
+
+def check(seed):
+    """runs one generated program in all configurations, returns (seed, source, input, differences)"""
+    program, text = random_program(seed)
+    source = assemble(program)
+    expected = run(source, text, CONFIGURATIONS['plain'])
+    differences = []
+    for name, options in CONFIGURATIONS.items():
+        if name != 'plain':
+            result = run(source, text, options)
+            if result != expected:
+                differences.append(f"{name}: exit code {result[1]}, plain {expected[1]}"
+                                   + (", stdout differs" if result[0] != expected[0] else ''))
+    return seed, source, text, expected[1], differences
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='differential', description='differential check of interpret.py')
+    parser.add_argument('--count', type=int, default=1000, help='number of generated programs')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first program')
+    parser.add_argument('--jobs', type=int, help='number of processes, default is number of CPUs')
+    parser.add_argument('--keep', help='directory for the programs which differ')
+    args = parser.parse_args()
+
+    seeds = range(args.seed, args.seed + args.count)
+    codes = {}
+    failed = 0
+    with concurrent.futures.ProcessPoolExecutor(args.jobs) as pool:
+        for seed, source, text, code, differences in pool.map(check, seeds, chunksize=16):
+            codes[code] = codes.get(code, 0) + 1
+            if not differences:
+                continue
+            failed += 1
+            print(f"seed {seed}: {'; '.join(differences)}")
+            if args.keep:
+                os.makedirs(args.keep, exist_ok=True)
+                with open(os.path.join(args.keep, f'{seed}.src'), 'wb') as f:
+                    f.write(source)
+                with open(os.path.join(args.keep, f'{seed}.in'), 'w') as f:
+                    f.write(text)
+
+    summary = ', '.join(f"{code}: {count}" for code, count in sorted(codes.items(), key=str))
+    print(f"{args.count - failed} of {args.count} programs same in {', '.join(CONFIGURATIONS)} (exit codes {summary})")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
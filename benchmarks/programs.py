@@ -0,0 +1,353 @@
+"""Helpers for generating IPPcode23 programs in the XML representation read by interpret.py"""
+import random
+import xml.etree.ElementTree as ET
+
+FRAMES = ('GF', 'LF', 'TF')
+LITERALS = ('int', 'bool', 'string', 'nil')
+TYPES = ('int', 'bool', 'string', 'nil')
+
+
+def arg_type(opcode, number, token):
+    """guesses the XML type attribute of one argument written in IPPcode23 syntax"""
+    prefix, _, _ = token.partition('@')
+    if '@' in token and prefix in FRAMES:
+        return 'var'
+    if '@' in token and prefix in LITERALS:
+        return prefix
+    if opcode == 'READ' and number == 2 and token in TYPES:
+        return 'type'
+    return 'label'
+
+
+def assemble(source):
+    """transforms IPPcode23 source text (one instruction per line) to XML bytes"""
+    program = ET.Element('program', language='IPPcode23')
+    order = 0
+    for line in source.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        opcode, *tokens = line.split()
+        opcode = opcode.upper()
+        order += 1
+        instruction = ET.SubElement(program, 'instruction', order=str(order), opcode=opcode)
+        for number, token in enumerate(tokens, 1):
+            type = arg_type(opcode, number, token)
+            arg = ET.SubElement(instruction, 'arg%d' % number, type=type)
+            if type in LITERALS:
+                arg.text = token.partition('@')[2]
+            else:
+                arg.text = token
+    return ET.tostring(program, encoding='UTF-8', xml_declaration=True)
+
+
+def counting_loop(iterations):
+    """tight arithmetic loop, returns (source, number of executed instructions)"""
+    source = f"""
+        DEFVAR GF@i
+        DEFVAR GF@c
+        MOVE GF@i int@0
+        LABEL loop
+        ADD GF@i GF@i int@1
+        LT GF@c GF@i int@{iterations}
+        JUMPIFEQ loop GF@c bool@true
+        WRITE GF@i
+    """
+    return source, 4 + 4 * iterations
+
+
+def straight_line(count, shuffle=True):
+    """program of count instructions where only the first one (EXIT) is executed, returns XML bytes
+
+    The order attributes are written in a shuffled sequence, so the loader has to sort them.
+    The XML is written directly as text, which keeps generating million-instruction files fast.
+    """
+    orders = list(range(2, count + 1))
+    if shuffle:
+        random.Random(count).shuffle(orders)
+
+    body = ['<?xml version="1.0" encoding="UTF-8"?>\n<program language="IPPcode23">\n',
+            '<instruction order="1" opcode="EXIT"><arg1 type="int">0</arg1></instruction>\n']
+    for order in orders:
+        if order % 2:
+            body.append(f'<instruction order="{order}" opcode="ADD"><arg1 type="var">GF@x</arg1>'
+                        f'<arg2 type="var">GF@x</arg2><arg3 type="int">{order}</arg3></instruction>\n')
+        else:
+            body.append(f'<instruction order="{order}" opcode="WRITE">'
+                        f'<arg1 type="string">line\\032{order}</arg1></instruction>\n')
+    body.append('</program>\n')
+    return ''.join(body).encode('UTF-8')
+
+
+def stack_fill(depth):
+    """pushes depth values to the data stack and pops them all, returns (source, executed instructions)"""
+    source = f"""
+        DEFVAR GF@i
+        DEFVAR GF@x
+        MOVE GF@i int@0
+        LABEL push
+        PUSHS GF@i
+        ADD GF@i GF@i int@1
+        JUMPIFNEQ push GF@i int@{depth}
+        LABEL pop
+        POPS GF@x
+        SUB GF@i GF@i int@1
+        JUMPIFNEQ pop GF@i int@0
+        WRITE GF@x
+    """
+    return source, 4 + 8 * depth
+
+
+def deep_recursion(depth):
+    """recursive CALL depth levels deep, every level with its own local frame
+
+    returns (source, executed instructions)
+    """
+    source = f"""
+        DEFVAR GF@n
+        MOVE GF@n int@{depth}
+        CALL rec
+        WRITE GF@n
+        EXIT int@0
+        LABEL rec
+        CREATEFRAME
+        PUSHFRAME
+        DEFVAR LF@level
+        MOVE LF@level GF@n
+        JUMPIFEQ base GF@n int@0
+        SUB GF@n GF@n int@1
+        CALL rec
+        LABEL base
+        POPFRAME
+        RETURN
+    """
+    return source, 14 + 11 * depth
+
+
+def write_heavy(count):
+    """writes count numbers, each followed by a newline, returns (source, executed instructions)"""
+    source = f"""
+        DEFVAR GF@i
+        MOVE GF@i int@0
+        LABEL loop
+        WRITE GF@i
+        WRITE string@\\010
+        ADD GF@i GF@i int@1
+        JUMPIFNEQ loop GF@i int@{count}
+    """
+    return source, 2 + 5 * count
+
+
+def fibonacci(n):
+    """naive recursive fibonacci, every call with its own local frame, returns (source, executed instructions)"""
+    source = f"""
+        DEFVAR GF@n
+        DEFVAR GF@r
+        MOVE GF@n int@{n}
+        CALL fib
+        WRITE GF@r
+        EXIT int@0
+        LABEL fib
+        CREATEFRAME
+        PUSHFRAME
+        DEFVAR LF@n
+        MOVE LF@n GF@n
+        DEFVAR LF@c
+        LT LF@c LF@n int@2
+        JUMPIFEQ small LF@c bool@true
+        SUB GF@n LF@n int@1
+        CALL fib
+        DEFVAR LF@a
+        MOVE LF@a GF@r
+        SUB GF@n LF@n int@2
+        CALL fib
+        ADD GF@r GF@r LF@a
+        POPFRAME
+        RETURN
+        LABEL small
+        MOVE GF@r LF@n
+        POPFRAME
+        RETURN
+    """
+    calls = [12, 12]  # instructions executed by fib(0), fib(1)
+    for _ in range(2, n + 1):
+        calls.append(17 + calls[-1] + calls[-2])
+    return source, 6 + calls[n]
+
+
+def string_building(length):
+    """builds a string by CONCAT, then reads and rewrites every character with GETCHAR/SETCHAR
+
+    returns (source, executed instructions)
+    """
+    source = f"""
+        DEFVAR GF@s
+        DEFVAR GF@i
+        DEFVAR GF@c
+        DEFVAR GF@n
+        MOVE GF@s string@
+        MOVE GF@i int@0
+        LABEL build
+        CONCAT GF@s GF@s string@a
+        ADD GF@i GF@i int@1
+        JUMPIFNEQ build GF@i int@{length}
+        MOVE GF@i int@0
+        LABEL edit
+        GETCHAR GF@c GF@s GF@i
+        SETCHAR GF@s GF@i string@b
+        ADD GF@i GF@i int@1
+        JUMPIFNEQ edit GF@i int@{length}
+        STRLEN GF@n GF@s
+        WRITE GF@n
+    """
+    return source, 9 + 9 * length
+
+
+def read_heavy(count):
+    """reads count numbers and writes their sum, returns (source, executed instructions, input text)"""
+    source = f"""
+        DEFVAR GF@x
+        DEFVAR GF@sum
+        DEFVAR GF@i
+        MOVE GF@sum int@0
+        MOVE GF@i int@0
+        LABEL loop
+        READ GF@x int
+        ADD GF@sum GF@sum GF@x
+        ADD GF@i GF@i int@1
+        JUMPIFNEQ loop GF@i int@{count}
+        WRITE GF@sum
+    """
+    text = ''.join(f'{number % 1000 - 500}\n' for number in range(count))
+    return source, 6 + 5 * count, text
+
+
+def many_functions(iterations, functions=500, names=20):
+    """CREATEFRAME loop of iterations and a recursion iterations / 5 levels deep in a program
+    with functions never called, each with names local variables
+
+    the run time and memory should not depend on functions; returns (source, executed instructions)
+    """
+    depth = iterations // 5
+    source = f"""
+        DEFVAR GF@i
+        MOVE GF@i int@0
+        LABEL loop
+        CREATEFRAME
+        PUSHFRAME
+        DEFVAR LF@x
+        POPFRAME
+        ADD GF@i GF@i int@1
+        JUMPIFNEQ loop GF@i int@{iterations}
+        MOVE GF@i int@{depth}
+        CALL rec
+        WRITE GF@i
+        EXIT int@0
+        LABEL rec
+        CREATEFRAME
+        PUSHFRAME
+        DEFVAR LF@level
+        MOVE LF@level GF@i
+        JUMPIFEQ base GF@i int@0
+        SUB GF@i GF@i int@1
+        CALL rec
+        LABEL base
+        POPFRAME
+        RETURN
+    """
+    for function in range(functions):
+        variables = ''.join(f"DEFVAR LF@v{function}_{name}\n" for name in range(names))
+        source += f"LABEL unused{function}\nCREATEFRAME\nPUSHFRAME\n{variables}POPFRAME\nRETURN\n"
+    return source, 16 + 6 * iterations + 11 * depth
+
+
+def random_program(seed):
+    """random program for the differential check, loops of every type of instruction with values
+    of all types in all frames, including type errors, missing frames and string buffers
+
+    values are reset at the end of every iteration, so they stay small; returns (source, input text)
+    """
+    r = random.Random(seed)
+    ints, strings, bools = ['GF@a', 'GF@b', 'LF@x'], ['GF@s', 'LF@y'], ['GF@p', 'TF@q']
+    variables = ints + strings + bools
+
+    def int_symb():
+        return r.choice(ints) if r.random() < 0.7 else f'int@{r.randint(-5, 9)}'
+
+    def string_symb():
+        return r.choice(strings) if r.random() < 0.7 else r.choice(['string@ab', 'string@', 'string@z\\035'])
+
+    def bool_symb():
+        return r.choice(bools) if r.random() < 0.7 else r.choice(['bool@true', 'bool@false'])
+
+    reset = ['MOVE GF@a int@1', 'MOVE GF@b int@2', 'MOVE LF@x int@3', 'MOVE GF@s string@qq', 'MOVE LF@y string@w',
+             'MOVE GF@p bool@true', 'MOVE TF@q bool@false']
+    lines = ['DEFVAR GF@n', 'MOVE GF@n int@0', 'DEFVAR GF@c', 'DEFVAR GF@a', 'DEFVAR GF@b', 'DEFVAR GF@s',
+             'DEFVAR GF@p', 'CREATEFRAME', 'PUSHFRAME', 'DEFVAR LF@x', 'DEFVAR LF@y', 'CREATEFRAME', 'DEFVAR TF@q']
+    lines += reset + ['JUMP main', 'LABEL fn', 'WRITE string@f', 'ADD GF@a GF@a int@1', 'RETURN', 'LABEL main',
+                      'LABEL top']
+    iterations = r.choice([3, 50, 200])
+    labels = 0
+    for _ in range(r.randint(4, 16)):
+        kind = r.choice(['arith', 'arith', 'idiv', 'compare', 'compare', 'logic', 'concat', 'append', 'setchar',
+                         'getchar', 'strlen', 'stri2int', 'int2char', 'write', 'write', 'type', 'stack',
+                         'stack_op', 'jump', 'increment', 'call', 'retype', 'move', 'read', 'frame'])
+        labels += 1
+        if kind == 'arith':
+            lines.append(f'{r.choice(["ADD", "SUB", "MUL"])} {r.choice(ints)} {int_symb()} {int_symb()}')
+        elif kind == 'idiv':
+            lines.append(f'IDIV {r.choice(ints)} {int_symb()} int@{r.choice([1, 2, -3, 0 if r.random() < 0.2 else 4])}')
+        elif kind == 'compare':
+            symb = r.choice([int_symb, string_symb, bool_symb])
+            lines.append(f'{r.choice(["LT", "GT", "EQ"])} {r.choice(bools)} {symb()} {symb()}')
+        elif kind == 'logic':
+            opcode = r.choice(['AND', 'OR', 'NOT'])
+            lines.append(f'{opcode} {r.choice(bools)} {bool_symb()}' + ('' if opcode == 'NOT' else f' {bool_symb()}'))
+        elif kind in ('concat', 'append'):
+            var = r.choice(strings)
+            first = var if kind == 'append' else string_symb()
+            lines += [f'CONCAT {var} {first} {string_symb()}', f'STRLEN GF@c {var}', 'LT GF@c GF@c int@40',
+                      f'JUMPIFEQ skip{labels} GF@c bool@true', f'MOVE {var} string@r', f'LABEL skip{labels}']
+        elif kind == 'setchar':
+            lines.append(f'SETCHAR {r.choice(strings)} int@{r.choice([0, 0, 1, 5])} {string_symb()}')
+        elif kind == 'getchar':
+            lines.append(f'GETCHAR {r.choice(strings)} {string_symb()} int@{r.choice([0, 1])}')
+        elif kind == 'strlen':
+            lines.append(f'STRLEN {r.choice(ints)} {string_symb()}')
+        elif kind == 'stri2int':
+            lines.append(f'STRI2INT {r.choice(ints)} {string_symb()} int@0')
+        elif kind == 'int2char':
+            lines.append(f'INT2CHAR {r.choice(strings)} int@{r.randint(65, 90)}')
+        elif kind == 'write':
+            lines.append(f'WRITE {r.choice([int_symb(), string_symb(), bool_symb(), "nil@nil"])}')
+        elif kind == 'type':
+            lines += [f'TYPE GF@c {r.choice(variables + ["GF@n"])}', 'WRITE GF@c']
+        elif kind == 'stack':
+            lines += [f'PUSHS {r.choice(variables)}', f'POPS {r.choice(variables)}']
+        elif kind == 'stack_op':
+            lines += [f'PUSHS {int_symb()}', f'PUSHS {int_symb()}', r.choice(['ADDS', 'SUBS', 'LTS', 'EQS']),
+                      f'POPS {r.choice(ints + bools)}']
+        elif kind == 'jump':
+            symb = r.choice([int_symb, string_symb, bool_symb])
+            lines += [f'{r.choice(["JUMPIFEQ", "JUMPIFNEQ"])} skip{labels} {symb()} {symb()}',
+                      f'WRITE string@s{labels}', f'LABEL skip{labels}']
+        elif kind == 'increment':
+            var = r.choice(ints)
+            lines.append(f'ADD {var} {var} int@1')
+        elif kind == 'call':
+            lines.append('CALL fn')
+        elif kind == 'retype':
+            value = r.choice(['nil@nil', 'int@4', 'string@t', 'bool@true'])
+            lines += [f'JUMPIFNEQ skip{labels} GF@n int@{r.randint(1, iterations + 5)}',
+                      f'MOVE {r.choice(variables)} {value}', f'LABEL skip{labels}']
+        elif kind == 'move':
+            lines.append(f'MOVE {r.choice(variables)} {r.choice(variables)}')
+        elif kind == 'read':
+            lines.append(f'READ {r.choice(variables)} {r.choice(["int", "string", "bool"])}')
+        elif kind == 'frame':
+            lines += [f'JUMPIFNEQ skip{labels} GF@n int@{r.randint(1, iterations + 5)}',
+                      r.choice(['POPFRAME', 'PUSHFRAME', 'CREATEFRAME']), f'LABEL skip{labels}']
+    lines += reset + ['ADD GF@n GF@n int@1', f'LT GF@c GF@n int@{iterations}', 'JUMPIFEQ top GF@c bool@true',
+                      'WRITE GF@n', 'WRITE LF@x']
+    text = ''.join(f"{r.choice(['1', '-7', 'true', 'abc', ''])}\n" for _ in range(r.randint(0, 30)))
+    return '\n'.join(lines), text
@@ -0,0 +1,178 @@
+"""Benchmark suite of generated IPPcode23 workloads
+
+usage: python -m benchmarks [--interpreter interpret.py] [--scale F] [--repeat R]
+                            [--only NAME ...] [--label TEXT] [--output results.json] [--compare old.json]
+
+Every workload is generated as an XML program (and input file) of configurable size, run by
+the interpreter in a fresh process and measured: best wall time of the repeats, executed
+instructions per second and peak RSS of the interpreter process. The results are written to
+a JSON file; --compare prints the speedup against results of another version.
+Runs offline, Linux only (peak RSS is taken from wait4).
+
+The runner and the measurement (measure, best, write_source, arguments) are shared by the
+focused benchmarks bench_*.py, which only define their workloads and reports.
+"""
+import argparse
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.programs import (assemble, counting_loop, fibonacci, many_functions, read_heavy, stack_fill,
+                                 string_building, write_heavy)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INTERPRETER = os.path.join(ROOT, 'interpret.py')
+
+# name: (generator, default size)
+WORKLOADS = {
+    'arith_loop': (counting_loop, 300000),
+    'fib_recursion': (fibonacci, 23),
+    'string_building': (string_building, 50000),
+    'stack_pushs_pops': (stack_fill, 200000),
+    'read_heavy': (read_heavy, 200000),
+    'write_heavy': (write_heavy, 200000),
+    'many_functions': (many_functions, 100000),
+}
+
+
+def scaled_size(name, scale):
+    """default size of the workload multiplied by scale"""
+    generator, size = WORKLOADS[name]
+    if generator is not fibonacci:
+        return max(1, int(size * scale))
+
+    # fibonacci grows exponentially, the scale applies to its executed instructions instead
+    target = fibonacci(size)[1] * scale
+    size = 1
+    while fibonacci(size + 1)[1] <= target:
+        size += 1
+    return size
+
+
+def measure(interpreter, source_file, input_file=None, stdout=None, timeout=None):
+    """runs the interpreter once in a fresh process, stdout is discarded unless a file is given,
+    returns (wall time, peak RSS in bytes, exit code) or None after timeout seconds"""
+    command = [sys.executable, interpreter, '--source', source_file]
+    if input_file is not None:
+        command += ['--input', input_file]
+    with open(os.devnull, 'wb') as devnull:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=stdout or devnull, stderr=devnull)
+        timer = threading.Timer(timeout, process.kill) if timeout is not None else None
+        if timer is not None:
+            timer.start()
+        _, status, usage = os.wait4(process.pid, 0)  # usage of this child only, unlike RUSAGE_CHILDREN
+        elapsed = time.perf_counter() - start
+        if timer is not None:
+            timer.cancel()
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if timeout is not None and process.returncode == -signal.SIGKILL and elapsed >= timeout:
+        return None
+    return elapsed, usage.ru_maxrss * 1024, process.returncode
+
+
+def best(interpreter, source_file, repeat=1, **options):
+    """runs measure repeat times, returns (best wall time, highest peak RSS, last exit code), None after timeout"""
+    runs = []
+    for _ in range(repeat):
+        run = measure(interpreter, source_file, **options)
+        if run is None:
+            return None
+        runs.append(run)
+    return min(run[0] for run in runs), max(run[1] for run in runs), runs[-1][2]
+
+
+def write_source(directory, name, data):
+    """writes the xml source (bytes) of a generated program to directory, returns its path"""
+    path = os.path.join(directory, f'{name}.xml')
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def arguments(prog, description):
+    """argument parser of a focused benchmark, positional arguments are the compared interpreters"""
+    parser = argparse.ArgumentParser(prog=prog, description=description)
+    parser.add_argument('interpreters', nargs='*', default=[INTERPRETER])
+    return parser
+
+
+def run_workload(interpreter, name, size, repeat, directory):
+    """generates and runs one workload, returns its result record"""
+    generator, _ = WORKLOADS[name]
+    generated = generator(size)
+    source, steps = generated[:2]
+    text = generated[2] if len(generated) > 2 else ''
+
+    source_file = write_source(directory, name, assemble(source))
+    input_file = os.path.join(directory, f'{name}.in')
+    with open(input_file, 'w') as f:
+        f.write(text)
+
+    wall, peak_rss, exit_code = best(interpreter, source_file, repeat, input_file=input_file)
+    return {
+        'size': size,
+        'instructions': steps,
+        'wall': wall,
+        'ips': steps / wall,
+        'peak_rss': peak_rss,
+        'exit_code': exit_code,
+    }
+
+
+def compare(results, baseline):
+    """prints speedup of the results against baseline results"""
+    for name, result in results['results'].items():
+        old = baseline['results'].get(name)
+        if old is None or old['instructions'] != result['instructions']:
+            print(f"{name:18} not comparable")
+            continue
+        print(f"{name:18} {old['wall']:8.3f} s -> {result['wall']:8.3f} s, "
+              f"speedup {old['wall'] / result['wall']:5.2f}x, "
+              f"RSS {old['peak_rss'] / 2 ** 20:6.1f} -> {result['peak_rss'] / 2 ** 20:6.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='benchmarks', description='benchmark suite of interpret.py')
+    parser.add_argument('--interpreter', default=INTERPRETER)
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplies default sizes of the workloads')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='+', choices=WORKLOADS, help='run only these workloads')
+    parser.add_argument('--label', default='', help='free text stored with the results, e.g. version')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help='results file of another version')
+    args = parser.parse_args()
+
+    results = {
+        'label': args.label,
+        'interpreter': os.path.abspath(args.interpreter),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.only or WORKLOADS:
+            size = scaled_size(name, args.scale)
+            result = run_workload(args.interpreter, name, size, args.repeat, directory)
+            results['results'][name] = result
+            print(f"{name:18} size {size:>8}  {result['wall']:8.3f} s  {result['ips']:>12,.0f} instr/s  "
+                  f"{result['peak_rss'] / 2 ** 20:7.1f} MiB  rc {result['exit_code']}")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+        f.write('\n')
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,1177 +3,2385 @@ import xml.etree.ElementTree as ET
 import argparse
 import sys
 import os
+import io
+import json
+import time
+import hashlib
+import marshal
+import concurrent.futures
+import importlib.util
+import py_compile
 
+VERSION = '2.0'  # part of the keys of cached programs (ProgramCache) together with digest of this file
 
-class Variable:
+
+class Nil:
+    """type of nil@nil, the only value of IPPcode23 type nil is NIL"""
+    def __repr__(self):
+        return 'nil'
+
+
+NIL = Nil()
+UNINITIALIZED = ('', None)  # slot of a declared variable without value, TYPE of it is ''
+
+
+class InterpretError(Exception):
     """
-    Class represents a variable
-    General management of variables ensures class Frames
+    ends the interpretation with the exit code, raised by errors of the program and by EXIT
+    the message, if any, is printed on stderr by Interpreter.main
     """
-    def __init__(self, frame, name):
-        """constructor"""
-        self.value = None
-        self.frame = frame
-        self.name = name
-        self.type = None
-
-    def get_value(self):
-        """"returns value of variable"""
-        if self.value is None:
-            print("value undefined", file=sys.stderr)
-            exit(56)
-        return self.value
-
-    def get_type(self):
-        """"returns type of variable"""
-        return self.type
-
-    def set_value(self, value, type):
-        """"set value of variable based on it's type"""
-        self.value = value
-        if type is None:
-            if re.match(r'^[0-9]+$', str(value)):
-                self.type = 'int'
+    def __init__(self, code, message=None):
+        super().__init__(code, message)
+        self.code = code
+        self.message = message
 
-            elif re.match(r'^(true|false)$', str(value)):
-                self.type = 'bool'
 
-            elif re.match(r'^(nil)$', str(value)):
-                self.type = 'nil'
+def open_file(path, mode='rb', **options):
+    """opens source or input file, a missing one is error 11 and an unreadable one 12 as checked by main"""
+    try:
+        return open(path, mode, **options)
+    except OSError:
+        raise InterpretError(11 if not os.path.isfile(path) else 12, f"cannot open {path}")
 
-            else:
-                self.type = 'string'
-        else:
-            self.type = type
+
+class Slots(dict):
+    """local or temporary frame of a program with many LF/TF names, slots are added by DEFVAR"""
+    __slots__ = ()
+
+    def __missing__(self, slot):
+        return None
 
 
 class Frames:
     """
     Class Frames is in charge of storing variables
-
+    Variables are resolved to slot indices while loading (Read_source.make_operand), global frame
+    is a flat list of slots, local and temporary frames are lists laid out by the shared layout
+    of LF/TF names, so that PUSHFRAME/POPFRAME only move the list. When the layout has more than
+    list_limit slots, the frames are Slots dicts instead, so creating a frame does not depend
+    on the number of LF/TF names in the whole program. A slot holds None for
+    an undeclared variable, UNINITIALIZED after DEFVAR and typed value (type, value) after assignment
+    SETCHAR and CONCAT appending to its first operand turn a string to a buffer ('buf', list of characters)
+    changed in place, only peek() returns it, read() turns it back to ('string', str) in its slot,
+    so the buffer is never shared by two variables or the data stack
     """
-    def __init__(self):
+    list_limit = 64  # the largest layout of local and temporary frames kept in lists
+
+    def __init__(self, glob_size=0, local_size=0):
         """constructor"""
-        self.local = []
+        self.local = []  # stack of local frames, the top one is the last item
         self.temp = None
-        self.glob = {}
-        self.locals = 0
+        self.glob = [None] * glob_size
+        self.local_size = local_size
+
+    def new(self):
+        """returns empty local or temporary frame"""
+        if self.local_size <= self.list_limit:
+            return [None] * self.local_size
+        return Slots()
 
     def createframe(self):
         """initializes temporary frame"""
-        self.temp = {}
-
-    def add_to_temp(self, variable):
-        """adds variable to temporary frame"""
-        if self.temp is None:
-            print("empty temporary", file=sys.stderr)
-            exit(55)
-
-        self.temp[variable.name] = variable
-
-    def add_to_glob(self, variable):
-        """adds variable to global frame"""
-
-        self.glob[variable.name] = variable
-
-    def add_to_local(self, variable):
-        """adds variable to local frame"""
-
-        new_var = {variable.name: variable}
-        self.local[0].update(new_var)
+        self.temp = self.new()
 
     def pushframe(self):
         """moves temporary frame to local frame"""
         if self.temp is None:
-            print("empty temporary", file=sys.stderr)
-            exit(55)
+            raise InterpretError(55, "empty temporary")
 
-        self.locals += 1
-        self.local.insert(0, self.temp)
+        self.local.append(self.temp)
         self.temp = None
 
     def popframe(self):
         """moves top local frame to temporary frame """
         if len(self.local) == 0:
-            print("empty local", file=sys.stderr)
-            exit(55)
+            raise InterpretError(55, "empty local")
 
-        self.locals -= 1
-        self.temp = self.local[0]
-        del self.local[0]
-
-    def exists(self, name, frame):
-        """checks whether the variable was declared """
+        self.temp = self.local.pop()
 
+    def frame(self, frame):
+        """returns list of slots of given frame"""
         if frame == 'GF':
-            if name in self.glob:
-                print("je v globalu ", file=sys.stderr)
-                return True
-
-        if frame == 'TF':
-            if self.temp is not None and name in self.temp:
-                print("je v temporary ", file=sys.stderr)
-                return True
+            return self.glob
+
         if frame == 'LF':
-            if len(self.local) > 0:
-                if name in self.local[0]:
-                    return True
+            if len(self.local) == 0:
+                raise InterpretError(55, "local frame not exists")
+            return self.local[-1]
 
-        return False
+        if self.temp is None:
+            raise InterpretError(55, "temporary not exists")
+        return self.temp
 
-    def can_access(self, opcode, name, frame):
-        """checks whether the caller of this function can access the variable """
-        if opcode == 'DEFVAR' or opcode == 'TYPE':
-            return True
-        else:
+    def define(self, operand):
+        """declares uninitialized variable given by the operand"""
+        variables = self.frame(operand.frame)
+        if variables[operand.slot] is not None:
+            raise InterpretError(52, "existuje")
 
-            if frame == 'GF':
-                if name in self.glob:
-                    return True
-                else:
-                    return False
-
-            elif frame == 'LF':
-                if len(self.local) > 0:
-                    if name in self.local[0]:
-                        return True
-                    else:
-                        return False
-                else:
-                    exit(55)
-            elif frame == 'TF':
-                if self.temp is None:
-                    print('TF after push', file=sys.stderr)
-                    exit(55)
-
-                if name in self.temp:
-                    return True
-                else:
-                    return False
-            else:
-                print("wrong frame can_access", file=sys.stderr)
-                exit(32)
+        variables[operand.slot] = UNINITIALIZED
 
-    def get_value(self, name, frame):
-        """ returns value of a variable """
-        if frame == 'GF':
+    def read(self, operand):
+        """returns typed value (type, value) of an operand"""
+        if operand.frame is None:
+            return operand.const
 
-            if name not in self.glob:
-                print("value undefined", file=sys.stderr)
-                exit(55)
+        if operand.frame == 'GF':
+            variables = self.glob
+        else:
+            variables = self.frame(operand.frame)
+
+        typed = variables[operand.slot]
+        if typed is None or typed is UNINITIALIZED:
+            self.undefined(operand, typed)
+        if typed[0] == 'buf':
+            typed = variables[operand.slot] = ('string', ''.join(typed[1]))
+        return typed
+
+    def peek(self, operand):
+        """returns typed value of an operand like read, a string buffer stays ('buf', list of characters)"""
+        if operand.frame is None:
+            return operand.const
+
+        typed = self.frame(operand.frame)[operand.slot]
+        if typed is None or typed is UNINITIALIZED:
+            self.undefined(operand, typed)
+        return typed
+
+    def get_type(self, operand):
+        """returns type of variable, empty string for uninitialized one """
+        typed = self.frame(operand.frame)[operand.slot]
+        if typed is None:
+            self.undefined(operand, typed)
+
+        return 'string' if typed[0] == 'buf' else typed[0]
+
+    def write(self, operand, typed):
+        """stores typed value to the variable given by the operand"""
+        if operand.frame == 'GF':
+            variables = self.glob
+        else:
+            variables = self.frame(operand.frame)
+
+        if variables[operand.slot] is None:
+            self.undefined(operand, None)
+        variables[operand.slot] = typed
+
+    @staticmethod
+    def initialized(variables):
+        """number of initialized variables in the frame, 0 for None"""
+        if variables is None:
+            return 0
+        return sum(1 for typed in (variables.values() if isinstance(variables, dict) else variables)
+                   if typed is not None and typed is not UNINITIALIZED)
+
+    def describe(self, operand):
+        """returns operand with its current value in IPPcode23 notation, for diagnostic messages"""
+        if operand.type == 'label' or operand.type == 'type':
+            return operand.value
+
+        if operand.frame is None:
+            typed = operand.const
+            name = ''
+        else:
+            name = f"{operand.frame}@{operand.value}="
+            if operand.frame == 'GF':
+                variables = self.glob
+            elif operand.frame == 'LF':
+                variables = self.local[-1] if self.local else None
+            else:
+                variables = self.temp
 
-            return self.glob[name].get_value()
-        elif frame == 'LF':
-            if len(self.local) > 0:
-                if name not in self.local[0]:
-                    print("value undefined", file=sys.stderr)
-                    exit(54)
-                else:
-                    return self.local[0][name].get_value()
+            typed = variables[operand.slot] if variables is not None else None
+            if typed is None or typed is UNINITIALIZED:
+                return name + '?'
 
-            else:
-                print("wrong frame", file=sys.stderr)
-                exit(54)
-
-        elif frame == 'TF':
-            if self.temp is not None:
-                if name not in self.temp:
-                    print("wrong frame or temporary not exists", file=sys.stderr)
-                    exit(54)
-                else:
-                    return self.temp[name].get_value()
-            else:
-                print("wrong frame or temporary not exists", file=sys.stderr)
-                exit(55)
+        type, value = typed
+        if type == 'bool':
+            value = 'true' if value else 'false'
+        elif type == 'buf':
+            type, value = 'string', ''.join(value)
+        return f"{name}{type}@{value!r}" if type == 'string' else f"{name}{type}@{value}"
 
-        else:
-            print("wrong frame get value", file=sys.stderr)
-            exit(32)
+    def undefined(self, operand, typed):
+        """reports access to undeclared (54) or uninitialized (56) variable"""
+        if typed is None:
+            raise InterpretError(54, f"variable {operand.frame}@{operand.value} not defined")
 
-    def get_type(self, name, frame):
-        """returns type of variable """
+        raise InterpretError(56, f"variable {operand.frame}@{operand.value} not initialized")
 
-        if frame == 'GF':
-            return self.glob[name].get_type()
-        elif frame == 'LF':
-            return self.local[0][name].get_type()
-        elif frame == 'TF':
-            return self.temp[name].get_type()
-
-    def set_value(self, frame, name, value, type):
-        """ set value of a variable """
-        if frame == 'GF':
-            if len(self.glob) != 0:
-                if name in self.glob:
-                    self.glob[name].set_value(value, type)
-                else:
-                    print("variale not in global", file=sys.stderr)
-                    exit(54)
 
-        elif frame == 'LF':
-            if len(self.local) > 0:
-                if name in self.local[0]:
-                    self.local[0][name].set_value(value, type)
-                else:
-                    print("variale not in local", file=sys.stderr)
-                    exit(54)
+class CountingFrames(Frames):
+    """
+    Frames keeping the number of initialized variables in all existing frames and its maximum (--vars),
+    the number changes when a variable gets its first value and when CREATEFRAME or POPFRAME
+    drop the temporary frame
+    """
+    def __init__(self, glob_size=0, local_size=0):
+        super().__init__(glob_size, local_size)
+        self.count = 0
+        self.max_count = 0
 
-        elif frame == 'TF':
-            if self.temp is not None:
-                if name in self.temp:
-                    self.temp[name].set_value(value, type)
-                else:
-                    print("variable not in temporary ", file=sys.stderr)
-                    exit(54)
-            else:
-                print("temporary not exists", file=sys.stderr)
-                exit(55)
+    def createframe(self):
+        """initializes temporary frame, variables of the dropped one are not counted anymore"""
+        self.count -= self.initialized(self.temp)
+        super().createframe()
+
+    def popframe(self):
+        """moves top local frame to temporary frame, variables of the dropped one are not counted anymore"""
+        dropped = self.temp
+        super().popframe()
+        self.count -= self.initialized(dropped)
+
+    def write(self, operand, typed):
+        """stores typed value to the variable, counts it if it had no value"""
+        if operand.frame == 'GF':
+            variables = self.glob
         else:
-            print("wrong frame set value", file=sys.stderr)
-            exit(32)
+            variables = self.frame(operand.frame)
+
+        if variables[operand.slot] is UNINITIALIZED:
+            self.count += 1
+            if self.count > self.max_count:
+                self.max_count = self.count
+        super().write(operand, typed)
 
 
 class Operand:
     """class represents one operand of an instruction """
-    def __init__(self, type, value, frame):
+    __slots__ = ('type', 'value', 'frame', 'slot', 'const')
+
+    def __init__(self, type, value, frame, slot=None):
         self.type = type
         self.value = value
         self.frame = frame
+        self.slot = slot  # index of variable in its frame, for label of a jump the index just past the LABEL
+        self.const = (type, value) if frame is None else None  # typed value of a constant operand
 
 
 class Instruction:
-    """class represents instruction of IPPcode23"""
-    def __init__(self, order, opcode, operands, frames, labels, input_file, datastack, jumper, input):
+    """
+    class represents instruction of IPPcode23
+    runtime state (frames, stacks, jumper, input) is held once by the Interpreter,
+    handlers get it as their argument
+    """
+    __slots__ = ('order', 'opcode', 'operands', 'run')
+
+    def __init__(self, order, opcode, operands):
         self.order = order
         self.opcode = opcode
         self.operands = operands
-        self.datastack = datastack
-        self.frames = frames
-        self.labels = labels
-        self.input = input_file
-        self.jumper = jumper
-        self.input = input
-        self.expected = None  # expected types of arguments
+        self.run = None  # handler bound by decode()
 
-    def check_operands(self):
-        """checks if the operands of an instruction are valid """
+    def op_move(self, interp):
+        """MOVE <var> <symb>"""
+        interp.frames.write(self.operands[0], interp.frames.read(self.operands[1]))
 
-        op_count = 0
-        for j in self.operands:
-            if j is not None:
-                op_count += 1
+        interp.jumper.current += 1
 
-        if op_count != len(self.expected):
-            print("wrong operand count", file=sys.stderr)
-            exit(32)
+    def op_createframe(self, interp):
+        """CREATEFRAME"""
+        interp.frames.createframe()
+        interp.jumper.current += 1
 
-        if self.operands[0] is None and (self.operands[1] is not None or self.operands[2] is not None):
-            print("missing argument", file=sys.stderr)
-            exit(32)
+    def op_popframe(self, interp):
+        """POPFRAME"""
+        interp.frames.popframe()
+        interp.jumper.current += 1
 
-        for o in self.operands:
-            if o is not None:
-                if o.type == 'var' and (not self.frames.can_access(self.opcode, o.value, o.frame)):
-                    exit(54)
+    def op_pushframe(self, interp):
+        """PUSHFRAME"""
+        interp.frames.pushframe()
+        interp.jumper.current += 1
 
-                if o.type == 'string':
+    def op_defvar(self, interp):
+        """DEFVAR <var>"""
+        interp.frames.define(self.operands[0])
+        interp.jumper.current += 1
 
-                    if o.value is None:
-                        o.value = ''
-                    print("string before processing " + o.value, file=sys.stderr)
+    def op_call(self, interp):
+        """CALL <label>"""
+        where_to_jump_back = interp.jumper.current + 1  # where will we continue after return
+        interp.jumper.jump_back.append(where_to_jump_back)  # STORE IT IN STACK
 
-                    o.value = replace_unicode_escape_sequences(o.value)
-                    print("string after processing" + o.value, file=sys.stderr)
+        interp.jumper.current = self.operands[0].slot  # bound by Jumper.bind_labels
 
+    def op_return(self, interp):
+        """RETURN"""
+        if len(interp.jumper.jump_back) == 0:
+            raise InterpretError(56, "empty calling stack")
 
-    def get_op_val(self, number):
-        """returns value of an operand"""
+        interp.jumper.current = interp.jumper.jump_back.pop()  # JUMP BACK AND POP IT
 
-        if self.operands[number] is not None:
-            if self.operands[number].type == 'var':
-                value = self.frames.get_value(self.operands[number].value, self.operands[number].frame)
-            else:
-                value = self.operands[number].value
+    def op_pushs(self, interp):
+        """PUSHS <symb>"""
+        interp.datastack.append(interp.frames.read(self.operands[0]))  # typed value, POPS keeps its type
 
-            return value
-        else:
-            print("wrong operand number ", file=sys.stderr)
-            exit(55)
-
-    def get_op_type(self, number):
-        """returns type of an operand"""
-        if self.operands[number] is not None:
-            if self.operands[number].type == 'var':
-                type = self.frames.get_type(self.operands[number].value, self.operands[number].frame)
-            else:
-                type = self.operands[number].type
+        interp.jumper.current += 1
 
-            return type
-        else:
-            print("wrong operand number ", file=sys.stderr)
-            exit(55)  # todo
+    def op_pops(self, interp):
+        """POPS <var>"""
+        if len(interp.datastack) == 0:
+            raise InterpretError(56, "empty data stack")
 
-    def execute(self):
-        """executes the instruction based on it's opcede and operands"""
-
-        match self.opcode.upper():
-            case 'MOVE':
-
-                self.expected = ['var', 'symb']
-                self.check_operands()
-
-                value1 = self.get_op_val(1)
-                type1 = self.get_op_type(1)
-                self.frames.set_value(self.operands[0].frame, self.operands[0].value, value1, type1)
-
-                self.jumper.current += 1
-
-            case 'CREATEFRAME':
-                self.expected = []
-                self.check_operands()
-                self.frames.createframe()
-                self.jumper.current += 1
-
-            case 'POPFRAME':
-                self.expected = []
-                self.check_operands()
-                self.frames.popframe()
-                self.jumper.current += 1
-
-            case 'PUSHFRAME':
-
-                self.expected = []
-                self.check_operands()
-                self.frames.pushframe()
-                self.jumper.current += 1
-
-            case 'DEFVAR':
-
-                self.expected = ['var']
-                self.check_operands()
-                var = Variable(self.operands[0].frame, self.operands[0].value)
-                if not self.frames.exists(self.operands[0].value, self.operands[0].frame):
-                    if var.frame == 'GF':
-                        self.frames.add_to_glob(var)
-                    elif var.frame == 'TF' and self.frames.temp is not None:
-                        if var not in self.frames.temp:
-                            self.frames.add_to_temp(var)
-                        else:
-                            print("found 2 ", file=sys.stderr)
-                            exit(52)
-                    else:
-                        if self.frames.locals > 0:
-                            self.frames.add_to_local(var)
-                        else:
-                            print("found 1 ", file=sys.stderr)
-                            exit(55)
+        interp.frames.write(self.operands[0], interp.datastack[-1])
+        interp.datastack.pop()
 
-                else:
-                    print("existuje", file=sys.stderr)
-                    exit(52)
-                self.jumper.current += 1
-
-            case 'CALL':
-                self.expected = ['label']
-                self.check_operands()
-                if self.operands[0].type != 'label':  # typ je label
-                    exit(53)
-
-                value1 = self.operands[0].value  # label existuje
-                if value1 not in self.jumper.labels:
-                    print("non existing label", file=sys.stderr)
-                    exit(52)
-
-                where_to_jump_back = self.jumper.current + 1  # where will we continue after return
-                self.jumper.jump_back.insert(0, where_to_jump_back)  # STORE IT IN STACK
-
-                self.jumper.current = self.jumper.labels[value1]  # SET CURRENT TO LABEL ORDER VALUE
-
-            case 'RETURN':
-                self.expected = []
-                self.check_operands()
-
-                if len(self.jumper.jump_back) == 0:
-                    print("empty calling stack", file=sys.stderr)
-                    exit(56)
-
-                self.jumper.current = self.jumper.jump_back[0]  # JUMP BACK
-                del self.jumper.jump_back[0]  # poP IT
-
-            case 'PUSHS':
-                self.expected = ['symb']
-                self.check_operands()
-                if self.operands[0].type == 'var':  # pushing variable
-                    value = self.frames.get_value(self.operands[0].value,
-                                                  self.operands[0].frame)  # get value of variable
-                    self.datastack.insert(0, value)
-                else:
-                    self.datastack.insert(0, self.operands[0].value)  # push directly value of constant
+        interp.jumper.current += 1
 
-                self.jumper.current += 1
+    def op_add(self, interp):
+        """ADD <var> <symb> <symb>"""
+        type1, value1 = interp.frames.read(self.operands[1])
+        type2, value2 = interp.frames.read(self.operands[2])
 
-            case 'POPS':
-                self.expected = ['var']
-                self.check_operands()
-                if len(self.datastack) != 0:
-                    self.frames.set_value(self.operands[0].frame, self.operands[0].value,
-                                          self.datastack[0], None)
-                    del self.datastack[0]
-                else:
-                    exit(56)
+        if type1 != 'int' or type2 != 'int':
+            raise InterpretError(53)
 
-                self.jumper.current += 1
+        interp.frames.write(self.operands[0], ('int', value1 + value2))
 
-            case 'ADD':
-                self.expected = ['var', 'symb', 'symb']
-                self.check_operands()
-                value1 = self.get_op_val(1)
-                value2 = self.get_op_val(2)
+        interp.jumper.current += 1
 
-                type1 = self.get_op_type(1)
-                type2 = self.get_op_type(2)
+    def op_sub(self, interp):
+        """SUB <var> <symb> <symb>"""
+        type1, value1 = interp.frames.read(self.operands[1])
+        type2, value2 = interp.frames.read(self.operands[2])
 
-                if type1 != type2 or type1 != 'int' or type1 is None:
-                    exit(53)
+        if type1 != 'int' or type2 != 'int':
+            raise InterpretError(53)
 
-                result = int(value1) + int(value2)
+        interp.frames.write(self.operands[0], ('int', value1 - value2))
 
-                self.frames.set_value(self.operands[0].frame, self.operands[0].value, result, 'int')
+        interp.jumper.current += 1
 
-                self.jumper.current += 1
+    def op_mul(self, interp):
+        """MUL <var> <symb> <symb>"""
+        type1, value1 = interp.frames.read(self.operands[1])
+        type2, value2 = interp.frames.read(self.operands[2])
 
-            case 'SUB':
-                self.expected = ['var', 'symb', 'symb']
-                self.check_operands()
-                value1 = self.get_op_val(1)
-                value2 = self.get_op_val(2)
+        if type1 != 'int' or type2 != 'int':
+            raise InterpretError(53)
 
-                type1 = self.get_op_type(1)
-                type2 = self.get_op_type(2)
+        interp.frames.write(self.operands[0], ('int', value1 * value2))
 
-                if type1 != type2 or type1 != 'int' or type1 is None:
-                    exit(53)
+        interp.jumper.current += 1
 
-                result = int(value1) - int(value2)
-                self.frames.set_value(self.operands[0].frame, self.operands[0].value, result, 'int')
+    def op_idiv(self, interp):
+        """IDIV <var> <symb> <symb>"""
+        type1, value1 = interp.frames.read(self.operands[1])
+        type2, value2 = interp.frames.read(self.operands[2])
 
-                self.jumper.current += 1
+        if type1 != 'int' or type2 != 'int':
+            raise InterpretError(53)
 
-            case 'MUL':
-                self.expected = ['var', 'symb', 'symb']
-                self.check_operands()
-                value1 = self.get_op_val(1)
-                value2 = self.get_op_val(2)
+        if value2 == 0:
+            raise InterpretError(57)
 
-                type1 = self.get_op_type(1)
-                type2 = self.get_op_type(2)
+        interp.frames.write(self.operands[0], ('int', value1 // value2))
 
-                if type1 != type2 or type1 != 'int' or type1 is None:
-                    exit(53)
+        interp.jumper.current += 1
 
-                result = int(value1) * int(value2)
-                self.frames.set_value(self.operands[0].frame, self.operands[0].value, result, 'int')
+    def op_lt(self, interp):
+        """LT <var> <symb> <symb>"""
+        type1, value1 = interp.frames.read(self.operands[1])
+        type2, value2 = interp.frames.read(self.operands[2])
 
-                self.jumper.current += 1
+        if type1 != type2 or type1 == 'nil':
+            raise InterpretError(53)
 
-            case 'IDIV':
-                self.expected = ['var', 'symb', 'symb']
-                self.check_operands()
-                value1 = self.get_op_val(1)
-                value2 = self.get_op_val(2)
-                type1 = self.get_op_type(1)
-                type2 = self.get_op_type(2)
+        interp.frames.write(self.operands[0], ('bool', value1 < value2))
 
-                if type1 != type2 or type1 != 'int' or type1 is None:
-                    exit(53)
+        interp.jumper.current += 1
 
-                if int(value2) == 0:
-                    exit(57)
+    def op_gt(self, interp):
+        """GT <var> <symb> <symb>"""
+        type1, value1 = interp.frames.read(self.operands[1])
+        type2, value2 = interp.frames.read(self.operands[2])
 
-                result = int(value1) // int(value2)
-                self.frames.set_value(self.operands[0].frame, self.operands[0].value, result, 'int')
+        if type1 != type2 or type1 == 'nil':
+            raise InterpretError(53)
 
-                self.jumper.current += 1
+        interp.frames.write(self.operands[0], ('bool', value1 > value2))
 
-            case 'LT':
-                self.expected = ['var', 'symb', 'symb']
-                self.check_operands()
-                value1 = self.get_op_val(1)
-                value2 = self.get_op_val(2)
+        interp.jumper.current += 1
 
-                type1 = self.get_op_type(1)
-                type2 = self.get_op_type(2)
+    def op_eq(self, interp):
+        """EQ <var> <symb> <symb>"""
+        type1, value1 = interp.frames.read(self.operands[1])
+        type2, value2 = interp.frames.read(self.operands[2])
 
-                if (type1 != type2):
-                    exit(53)
+        if type1 != type2 and type1 != 'nil' and type2 != 'nil':
+            raise InterpretError(53)
 
-                if (type1 == 'nil') or (type2 == 'nil'):
-                    exit(53)
+        interp.frames.write(self.operands[0], ('bool', type1 == type2 and value1 == value2))
 
-                if (type1 == 'int'):
-                    result = int(value1) < int(value2)
-                else:
-                    result = value1 < value2
+        interp.jumper.current += 1
 
-                if result is True:
-                    result = 'true'
-                else:
-                    result = 'false'
-                self.frames.set_value(self.operands[0].frame, self.operands[0].value, result, 'bool')
+    def op_and(self, interp):
+        """AND <var> <symb> <symb>"""
+        type1, value1 = interp.frames.read(self.operands[1])
+        type2, value2 = interp.frames.read(self.operands[2])
 
-                self.jumper.current += 1
+        if type1 != 'bool' or type2 != 'bool':
+            raise InterpretError(53)
 
-            case 'GT':
-                self.expected = ['var', 'symb', 'symb']
-                self.check_operands()
-                value1 = self.get_op_val(1)
-                value2 = self.get_op_val(2)
-                print(f"value 1 {value1} ", file=sys.stderr)
-                print(f"value 2 {value2} ", file=sys.stderr)
-                type1 = self.get_op_type(1)
-                type2 = self.get_op_type(2)
+        interp.frames.write(self.operands[0], ('bool', value1 and value2))
 
-                if (type1 != type2):
-                    exit(53)
+        interp.jumper.current += 1
 
-                if (type1 == 'nil') or (type2 == 'nil'):
-                    exit(53)
+    def op_or(self, interp):
+        """OR <var> <symb> <symb>"""
+        type1, value1 = interp.frames.read(self.operands[1])
+        type2, value2 = interp.frames.read(self.operands[2])
 
-                if (type1 == 'int'):
-                    result = int(value1) > int(value2)
-                else:
-                    result = value1 > value2
+        if type1 != 'bool' or type2 != 'bool':
+            raise InterpretError(53)
 
-                if result is True:
-                    result = 'true'
-                else:
-                    result = 'false'
-                self.frames.set_value(self.operands[0].frame, self.operands[0].value, result, 'bool')
+        interp.frames.write(self.operands[0], ('bool', value1 or value2))
 
-                self.jumper.current += 1
+        interp.jumper.current += 1
 
-            case 'EQ':
-                self.expected = ['var', 'symb', 'symb']
-                self.check_operands()
-                value1 = self.get_op_val(1)
-                value2 = self.get_op_val(2)
+    def op_not(self, interp):
+        """NOT <var> <symb>"""
+        type1, value1 = interp.frames.read(self.operands[1])
+        if type1 != 'bool':
+            raise InterpretError(53)
 
-                type1 = self.get_op_type(1)
-                type2 = self.get_op_type(2)
+        interp.frames.write(self.operands[0], ('bool', not value1))
 
-                if (type1 != type2) and (type1 != 'nil' and type2 != 'nil'):
-                    exit(53)
+        interp.jumper.current += 1
 
-                if type1 == 'int' or type2 == 'int':
-                    if (type1 == 'nil') or (type2 == 'nil'):
-                        result = False
-                    else:
-                        result = int(value1) == int(value2)
-                else:
-                    result = value1 == value2
+    def op_int2char(self, interp):
+        """INT2CHAR <var> <symb>"""
+        type1, value1 = interp.frames.read(self.operands[1])
+        if type1 != 'int':
+            raise InterpretError(53)
 
-                if result is True:
-                    result = 'true'
-                else:
-                    result = 'false'
-                self.frames.set_value(self.operands[0].frame, self.operands[0].value, result, 'bool')
+        if value1 < 0 or value1 > 128:
+            raise InterpretError(58)
 
-                self.jumper.current += 1
+        try:
+            result = chr(value1)
+        except ValueError:
+            raise InterpretError(53, "value out of range")
 
-            case 'AND':
-                self.expected = ['var', 'symb', 'symb']
-                self.check_operands()
-                value1 = self.get_op_val(1)
-                value2 = self.get_op_val(2)
+        interp.frames.write(self.operands[0], ('string', result))
 
-                type1 = self.get_op_type(1)
-                type2 = self.get_op_type(2)
+        interp.jumper.current += 1
 
-                if type1 != type2 or type1 != 'bool':
-                    exit(53)
+    def op_stri2int(self, interp):
+        """STRI2INT <var> <symb> <symb>"""
+        type1, value1 = interp.frames.peek(self.operands[1])
+        type2, value2 = interp.frames.read(self.operands[2])
 
-                if value1 == 'true':
-                    value1 = True
-                else:
-                    value1 = False
+        if (type1 != 'string' and type1 != 'buf') or type2 != 'int':
+            raise InterpretError(53)
 
-                if value2 == 'true':
-                    value2 = True
-                else:
-                    value2 = False
+        if value2 >= len(value1) or value2 < 0:
+            raise InterpretError(58, "value out of range")
 
-                result = value1 and value2
-                if result is True:
-                    result1 = 'true'
-                else:
-                    result1 = 'false'
-                self.frames.set_value(self.operands[0].frame, self.operands[0].value, result1, 'bool')
+        interp.frames.write(self.operands[0], ('int', ord(value1[value2])))
 
-                self.jumper.current += 1
+        interp.jumper.current += 1
 
-            case 'OR':
-                self.expected = ['var', 'symb', 'symb']
-                self.check_operands()
+    def op_read(self, interp):
+        """READ <var> <type>"""
+        interp.frames.write(self.operands[0], interp.input.read(self.operands[1].value))
 
-                value1 = self.get_op_val(1)
-                value2 = self.get_op_val(2)
+        interp.jumper.current += 1
 
-                type1 = self.get_op_type(1)
-                type2 = self.get_op_type(2)
+    def op_write(self, interp):
+        """WRITE <symb>"""
+        type1, value = interp.frames.read(self.operands[0])
 
-                if type1 != type2 or type1 != 'bool':
-                    exit(53)
+        if type1 == 'bool':
+            interp.output.write('true' if value else 'false')
+        elif type1 == 'string':
+            interp.output.write(value)
+        elif type1 != 'nil':
+            interp.output.write(str(value))
 
-                if value1 == 'true':
-                    value1 = True
-                else:
-                    value1 = False
+        interp.jumper.current += 1
 
-                if value2 == 'true':
-                    value2 = True
-                else:
-                    value2 = False
+    def op_concat(self, interp):
+        """CONCAT <var> <symb> <symb>"""
+        var, symb1, symb2 = self.operands
+        if symb1.frame != var.frame or symb1.slot != var.slot:
+            type1, value1 = interp.frames.read(symb1)
+            type2, value2 = interp.frames.read(symb2)
 
-                result = value1 or value2
-                if result is True:
-                    result1 = 'true'
-                else:
-                    result1 = 'false'
+            if type1 != 'string' or type2 != 'string':
+                raise InterpretError(53)
 
-                self.frames.set_value(self.operands[0].frame, self.operands[0].value, result1, 'bool')
+            interp.frames.write(var, ('string', value1 + value2))
+            interp.jumper.current += 1
+            return
 
-                self.jumper.current += 1
+        # appending to the variable extends its buffer in place instead of copying the string
+        type1, value1 = interp.frames.peek(symb1)
+        type2, value2 = interp.frames.read(symb2)
 
-            case 'NOT':
-                self.expected = ['var', 'symb']
-                self.check_operands()
-                value1 = self.get_op_val(1)
-                type1 = self.get_op_type(1)
-                if type1 != 'bool':
-                    exit(53)
+        if (type1 != 'string' and type1 != 'buf') or type2 != 'string':
+            raise InterpretError(53)
 
-                if value1 == 'true':
-                    value1 = True
-                else:
-                    value1 = False
-                result = not value1
-                if result is True:
-                    result1 = 'true'
-                else:
-                    result1 = 'false'
-                self.frames.set_value(self.operands[0].frame, self.operands[0].value, result1, 'bool')
+        if type1 == 'string':
+            value1 = list(value1)
+        value1.extend(value2)
+        interp.frames.write(var, ('buf', value1))  # read of symb2 may have turned the slot back to string
 
-                self.jumper.current += 1
+        interp.jumper.current += 1
 
-            case 'INT2CHAR':
-                self.expected = ['var', 'symb']
-                self.check_operands()
-                value1 = self.get_op_val(1)
-                type1 = self.get_op_type(1)
-                if type1 != 'int':
-                    exit(53)
+    def op_strlen(self, interp):
+        """STRLEN <var> <symb>"""
+        type1, value1 = interp.frames.peek(self.operands[1])
+        if type1 != 'string' and type1 != 'buf':
+            raise InterpretError(53)
 
-                if int(value1) < 0 or int(value1) > 128:
-                    exit(58)
+        interp.frames.write(self.operands[0], ('int', len(value1)))
 
-                try:
-                    result = chr(int(value1))
-                except ValueError:
-                    print("value out of range", file=sys.stderr)
-                    exit(53)
+        interp.jumper.current += 1
 
-                self.frames.set_value(self.operands[0].frame, self.operands[0].value, result, 'string')
+    def op_getchar(self, interp):
+        """GETCHAR <var> <symb> <symb>"""
+        type1, value1 = interp.frames.peek(self.operands[1])
+        type2, value2 = interp.frames.read(self.operands[2])
 
-                self.jumper.current += 1
+        if (type1 != 'string' and type1 != 'buf') or type2 != 'int':
+            raise InterpretError(53)
 
-            case 'STRI2INT':
-                self.expected = ['var', 'symb', 'symb']
-                self.check_operands()
+        if value2 >= len(value1) or value2 < 0:
+            raise InterpretError(58, "value out of range")
 
-                value1 = self.get_op_val(1)
-                value2 = self.get_op_val(2)
+        interp.frames.write(self.operands[0], ('string', value1[value2]))
 
-                type1 = self.get_op_type(1)
-                type2 = self.get_op_type(2)
+        interp.jumper.current += 1
 
-                if type1 != 'string' or type2 != 'int':
-                    exit(53)
+    def op_setchar(self, interp):
+        """SETCHAR <var> <symb> <symb>"""
+        type0, var = interp.frames.peek(self.operands[0])
+        type1, symb1 = interp.frames.read(self.operands[1])
+        type2, symb2 = interp.frames.read(self.operands[2])
 
-                if int(value2) >= len(value1) or int(value2) < 0:
-                    print("value out of range", file=sys.stderr)
-                    exit(58)
+        if type1 != 'int' or type2 != 'string' or (type0 != 'string' and type0 != 'buf'):
+            raise InterpretError(53)
 
-                char = value1[int(value2)]
-                try:
-                    result = ord(char)
-                except ValueError:
-                    print("value out of range", file=sys.stderr)
-                    exit(53)
+        if symb1 >= len(var) or symb1 < 0 or symb2 == '':
+            raise InterpretError(58, "value out of range")
 
-                self.frames.set_value(self.operands[0].frame, self.operands[0].value, result, 'int')
+        if type0 == 'string':  # the first SETCHAR turns the string to a buffer changed in place
+            var = list(var)
+        var[symb1] = symb2[0]
+        interp.frames.write(self.operands[0], ('buf', var))
 
-                self.jumper.current += 1
+        interp.jumper.current += 1
 
-            case 'READ':
-                self.expected = ['var', 'type']
-                self.check_operands()
+    def op_type(self, interp):
+        """TYPE <var> <symb>"""
+        operand = self.operands[1]
+        if operand.type == 'var':
+            type1 = interp.frames.get_type(operand)
+        else:
+            type1 = operand.type
 
-                type2 = self.operands[1].value
+        interp.frames.write(self.operands[0], ('string', type1))
 
-                if self.input is None:
-                    try:
-                        line = input(sys.stdin.buffer)
-                        if type2 == 'int':
-                            if re.match(r'^(-)?[0-9]\d*$', str(line)):
-                                result = int(line)
-                            else:
-                                result = 'nil'
-                                type2 = 'nil'
-                        elif type2 == 'bool':
+        interp.jumper.current += 1
 
-                            if re.match(r'^(true)$', str(line), re.IGNORECASE):
-                                result = 'true'
-                            else:
-                                result = 'false'
+    def op_label(self, interp):
+        """LABEL <label>"""
+        interp.jumper.current += 1
 
-                        else:
-                            result = line
+    def op_jump(self, interp):
+        """JUMP <label>"""
+        interp.jumper.current = self.operands[0].slot
 
-                        print(f"result is  {result}", file=sys.stderr)
-                        self.frames.set_value(self.operands[0].frame, self.operands[0].value, result, type2)
-                    except EOFError:
-                        self.frames.set_value(self.operands[0].frame, self.operands[0].value, 'nil', 'nil')
+    def op_jumpifeq(self, interp):
+        """JUMPIFEQ <label> <symb> <symb>"""
+        type1, value1 = interp.frames.read(self.operands[1])
+        type2, value2 = interp.frames.read(self.operands[2])
 
-                else:
-                    line = self.input[self.jumper.input_index]
-                    if type2 == 'int':
-                        if re.match(r'^(-)?[0-9]\d*$', str(line)):
-                            result = int(line)
-                        else:
-                            result = 'nil'
-                            type2 = 'nil'
-                    elif type2 == 'bool':
+        if type1 != type2 and type1 != 'nil' and type2 != 'nil':
+            raise InterpretError(53)
 
-                        if re.match(r'^(true)$', str(line), re.IGNORECASE):
-                            result = 'true'
-                        else:
-                            result = 'false'
+        if type1 == type2 and value1 == value2:
+            interp.jumper.current = self.operands[0].slot
+        else:
+            interp.jumper.current += 1
 
-                    else:
-                        result = line
+    def op_jumpifneq(self, interp):
+        """JUMPIFNEQ <label> <symb> <symb>"""
+        type1, value1 = interp.frames.read(self.operands[1])
+        type2, value2 = interp.frames.read(self.operands[2])
 
-                    print(f"result is  {result}", file=sys.stderr)
-                    self.frames.set_value(self.operands[0].frame, self.operands[0].value, result, type2)
+        if type1 != type2 and type1 != 'nil' and type2 != 'nil':
+            raise InterpretError(53)
 
-                if self.jumper.input_index < (len(self.input) - 1):
-                    self.jumper.input_index += 1
+        if type1 == type2 and value1 == value2:
+            interp.jumper.current += 1
+        else:
+            interp.jumper.current = self.operands[0].slot
 
-                self.jumper.current += 1
+    def op_exit(self, interp):
+        """EXIT <symb>"""
+        type1, value1 = interp.frames.read(self.operands[0])
 
-            case 'WRITE':
+        if type1 != 'int':
+            raise InterpretError(53)
 
-                self.expected = ['symb']
-                self.check_operands()
+        if value1 < 0 or value1 > 49:
+            raise InterpretError(57)
 
-                value = self.get_op_val(0)
-                type1 = self.get_op_type(0)
+        raise InterpretError(value1)
 
-                print(f"{value}", file=sys.stderr)
-                if value == 'nil':
-                    print("", end='')
-                else:
-                    print(value, end='')
+    def op_dprint(self, interp):
+        """DPRINT <symb>"""
+        type1, value1 = interp.frames.read(self.operands[0])
+        print(value1, file=interp.stderr)
+        interp.jumper.current += 1
 
-                self.jumper.current += 1
+    def op_break(self, interp):
+        """BREAK"""
+        interp.jumper.current += 1
 
-            case 'CONCAT':
-                self.expected = ['var', 'symb', 'symb']
-                self.check_operands()
+    # STACK extension, operands are taken from the data stack and results pushed back to it
 
-                value1 = self.get_op_val(1)
-                value2 = self.get_op_val(2)
+    def pop_operand(self, interp):
+        """pops typed value from the data stack"""
+        if len(interp.datastack) == 0:
+            raise InterpretError(56, "empty data stack")
 
-                type1 = self.get_op_type(1)
-                type2 = self.get_op_type(2)
+        return interp.datastack.pop()
 
-                if type1 != 'string' or type2 != 'string':
-                    exit(53)
-                if value1 is None:
-                    value1 = ''
-                if value2 is None:
-                    value2 = ''
-                result = value1 + value2
-                self.frames.set_value(self.operands[0].frame, self.operands[0].value, result, 'string')
+    def pop_operands(self, interp):
+        """pops two typed values from the data stack, returns them in the order they were pushed"""
+        if len(interp.datastack) < 2:
+            raise InterpretError(56, "empty data stack")
 
-                self.jumper.current += 1
+        typed2 = interp.datastack.pop()
+        return interp.datastack.pop(), typed2
 
-            case 'STRLEN':
-                self.expected = ['var', 'symb']
-                self.check_operands()
+    def op_clears(self, interp):
+        """CLEARS"""
+        interp.datastack.clear()
+        interp.jumper.current += 1
 
-                value1 = self.get_op_val(1)
+    def op_adds(self, interp):
+        """ADDS"""
+        (type1, value1), (type2, value2) = self.pop_operands(interp)
 
-                type1 = self.get_op_type(1)
-                if type1 != 'string':
-                    exit(53)
+        if type1 != 'int' or type2 != 'int':
+            raise InterpretError(53)
 
-                if value1 is None or value1 == '':
-                    result = 0
-                else:
-                    result = len(value1)
+        interp.datastack.append(('int', value1 + value2))
+        interp.jumper.current += 1
 
-                self.frames.set_value(self.operands[0].frame, self.operands[0].value, result, 'int')
+    def op_subs(self, interp):
+        """SUBS"""
+        (type1, value1), (type2, value2) = self.pop_operands(interp)
 
-                self.jumper.current += 1
+        if type1 != 'int' or type2 != 'int':
+            raise InterpretError(53)
 
-            case 'GETCHAR':
-                self.expected = ['var', 'symb', 'symb']
-                self.check_operands()
+        interp.datastack.append(('int', value1 - value2))
+        interp.jumper.current += 1
 
-                value1 = self.get_op_val(1)
-                value2 = self.get_op_val(2)
+    def op_muls(self, interp):
+        """MULS"""
+        (type1, value1), (type2, value2) = self.pop_operands(interp)
 
-                type1 = self.get_op_type(1)
-                type2 = self.get_op_type(2)
+        if type1 != 'int' or type2 != 'int':
+            raise InterpretError(53)
 
-                if type1 != 'string' or type2 != 'int':
-                    exit(53)
+        interp.datastack.append(('int', value1 * value2))
+        interp.jumper.current += 1
 
-                if int(value2) >= len(value1) or int(value2) < 0:
-                    print("value out of range", file=sys.stderr)
-                    exit(58)
+    def op_idivs(self, interp):
+        """IDIVS"""
+        (type1, value1), (type2, value2) = self.pop_operands(interp)
 
-                result = value1[int(value2)]
-                self.frames.set_value(self.operands[0].frame, self.operands[0].value, result, 'string')
+        if type1 != 'int' or type2 != 'int':
+            raise InterpretError(53)
 
-                self.jumper.current += 1
+        if value2 == 0:
+            raise InterpretError(57)
 
-            case 'SETCHAR':
-                self.expected = ['var', 'symb', 'symb']
-                self.check_operands()
+        interp.datastack.append(('int', value1 // value2))
+        interp.jumper.current += 1
 
-                var = self.get_op_val(0)
-                symb1 = self.get_op_val(1)
-                symb2 = self.get_op_val(2)
+    def op_lts(self, interp):
+        """LTS"""
+        (type1, value1), (type2, value2) = self.pop_operands(interp)
 
-                type0 = self.get_op_type(0)
-                type1 = self.get_op_type(1)
-                type2 = self.get_op_type(2)
+        if type1 != type2 or type1 == 'nil':
+            raise InterpretError(53)
 
-                if type1 != 'int' or type2 != 'string' or type0 != 'string':
-                    exit(53)
+        interp.datastack.append(('bool', value1 < value2))
+        interp.jumper.current += 1
 
-                if int(symb1) >= len(var) or int(symb1) < 0 or symb2 == '':
-                    print("value out of range", file=sys.stderr)
-                    exit(58)
+    def op_gts(self, interp):
+        """GTS"""
+        (type1, value1), (type2, value2) = self.pop_operands(interp)
 
-                posn = int(symb1)
-                nc = symb2[0]
-                var = var[:posn] + nc + var[posn + 1:]
-                self.frames.set_value(self.operands[0].frame, self.operands[0].value, var, 'string')
+        if type1 != type2 or type1 == 'nil':
+            raise InterpretError(53)
 
-                self.jumper.current += 1
+        interp.datastack.append(('bool', value1 > value2))
+        interp.jumper.current += 1
 
-            case 'TYPE':
-                self.expected = ['var', 'symb']
-                self.check_operands()
+    def op_eqs(self, interp):
+        """EQS"""
+        (type1, value1), (type2, value2) = self.pop_operands(interp)
 
-                var = self.get_op_val(1)  # variable unused on purpose
-                type1 = self.get_op_type(1)
+        if type1 != type2 and type1 != 'nil' and type2 != 'nil':
+            raise InterpretError(53)
 
-                self.frames.set_value(self.operands[0].frame, self.operands[0].value, type1, 'string')
+        interp.datastack.append(('bool', type1 == type2 and value1 == value2))
+        interp.jumper.current += 1
 
-                self.jumper.current += 1
+    def op_ands(self, interp):
+        """ANDS"""
+        (type1, value1), (type2, value2) = self.pop_operands(interp)
 
-            case 'LABEL':
+        if type1 != 'bool' or type2 != 'bool':
+            raise InterpretError(53)
 
-                self.expected = ['label']
-                self.check_operands()
-                self.jumper.current += 1
+        interp.datastack.append(('bool', value1 and value2))
+        interp.jumper.current += 1
 
-            case 'JUMP':
-                self.expected = ['label']
-                self.check_operands()
+    def op_ors(self, interp):
+        """ORS"""
+        (type1, value1), (type2, value2) = self.pop_operands(interp)
 
-                label_name = self.get_op_val(0)
+        if type1 != 'bool' or type2 != 'bool':
+            raise InterpretError(53)
 
-                if label_name not in self.jumper.labels:
-                    print("non existing label", file=sys.stderr)
-                    exit(52)
+        interp.datastack.append(('bool', value1 or value2))
+        interp.jumper.current += 1
 
-                self.jumper.current = self.jumper.labels[label_name]
+    def op_nots(self, interp):
+        """NOTS"""
+        type1, value1 = self.pop_operand(interp)
 
-            case 'JUMPIFEQ':
-                self.expected = ['label', 'symb', 'symb']
-                self.check_operands()
+        if type1 != 'bool':
+            raise InterpretError(53)
 
-                label_name = self.operands[0].value
-                value1 = self.get_op_val(1)
-                value2 = self.get_op_val(2)
+        interp.datastack.append(('bool', not value1))
+        interp.jumper.current += 1
 
-                type1 = self.get_op_type(1)
-                type2 = self.get_op_type(2)
+    def op_int2chars(self, interp):
+        """INT2CHARS"""
+        type1, value1 = self.pop_operand(interp)
 
-                if (type1 != type2) and (type1 != 'nil' and type2 != 'nil'):
-                    exit(53)
+        if type1 != 'int':
+            raise InterpretError(53)
 
-                if label_name not in self.jumper.labels:
-                    print("non existing label", file=sys.stderr)
-                    exit(52)
+        if value1 < 0 or value1 > 128:
+            raise InterpretError(58)
 
-                if type1 == 'int' or type2 == 'int':
-                    if (type1 == 'nil') or (type2 == 'nil'):
-                        result = False
-                    else:
-                        result = int(value1) == int(value2)
-                else:
-                    result = value1 == value2
-                if result:
-                    self.jumper.current = self.jumper.labels[label_name]
-                else:
-                    self.jumper.current += 1
+        interp.datastack.append(('string', chr(value1)))
+        interp.jumper.current += 1
 
-            case 'JUMPIFNEQ':
-                self.expected = ['label', 'symb', 'symb']
-                self.check_operands()
+    def op_stri2ints(self, interp):
+        """STRI2INTS"""
+        (type1, value1), (type2, value2) = self.pop_operands(interp)
 
-                label_name = self.operands[0].value
-                value1 = self.get_op_val(1)
-                value2 = self.get_op_val(2)
+        if type1 != 'string' or type2 != 'int':
+            raise InterpretError(53)
 
-                type1 = self.get_op_type(1)
-                type2 = self.get_op_type(2)
+        if value2 >= len(value1) or value2 < 0:
+            raise InterpretError(58, "value out of range")
 
-                if (type1 != type2) and (type1 != 'nil' and type2 != 'nil'):
-                    exit(53)
+        interp.datastack.append(('int', ord(value1[value2])))
+        interp.jumper.current += 1
 
-                if label_name not in self.jumper.labels:
-                    print("non existing label", file=sys.stderr)
-                    exit(52)
+    def op_jumpifeqs(self, interp):
+        """JUMPIFEQS <label>"""
+        (type1, value1), (type2, value2) = self.pop_operands(interp)
 
-                if type1 == 'int' or type2 == 'int':
-                    if (type1 == 'nil') or (type2 == 'nil'):
-                        result = False
-                    else:
-                        result = int(value1) == int(value2)
-                else:
-                    result = value1 == value2
+        if type1 != type2 and type1 != 'nil' and type2 != 'nil':
+            raise InterpretError(53)
 
-                if result:
-                    self.jumper.current += 1
-                else:
-                    self.jumper.current = self.jumper.labels[label_name]
+        if type1 == type2 and value1 == value2:
+            interp.jumper.current = self.operands[0].slot
+        else:
+            interp.jumper.current += 1
 
-            case 'EXIT':
-                self.expected = ['symb']
-                self.check_operands()
+    def op_jumpifneqs(self, interp):
+        """JUMPIFNEQS <label>"""
+        (type1, value1), (type2, value2) = self.pop_operands(interp)
 
-                value1 = self.get_op_val(0)
-                type1 = self.get_op_type(0)
+        if type1 != type2 and type1 != 'nil' and type2 != 'nil':
+            raise InterpretError(53)
 
-                if type1 != 'int':
-                    exit(53)
+        if type1 == type2 and value1 == value2:
+            interp.jumper.current += 1
+        else:
+            interp.jumper.current = self.operands[0].slot
+
+    handlers = {
+        'MOVE': op_move,
+        'CREATEFRAME': op_createframe,
+        'POPFRAME': op_popframe,
+        'PUSHFRAME': op_pushframe,
+        'DEFVAR': op_defvar,
+        'CALL': op_call,
+        'RETURN': op_return,
+        'PUSHS': op_pushs,
+        'POPS': op_pops,
+        'ADD': op_add,
+        'SUB': op_sub,
+        'MUL': op_mul,
+        'IDIV': op_idiv,
+        'LT': op_lt,
+        'GT': op_gt,
+        'EQ': op_eq,
+        'AND': op_and,
+        'OR': op_or,
+        'NOT': op_not,
+        'INT2CHAR': op_int2char,
+        'STRI2INT': op_stri2int,
+        'READ': op_read,
+        'WRITE': op_write,
+        'CONCAT': op_concat,
+        'STRLEN': op_strlen,
+        'GETCHAR': op_getchar,
+        'SETCHAR': op_setchar,
+        'TYPE': op_type,
+        'LABEL': op_label,
+        'JUMP': op_jump,
+        'JUMPIFEQ': op_jumpifeq,
+        'JUMPIFNEQ': op_jumpifneq,
+        'EXIT': op_exit,
+        'DPRINT': op_dprint,
+        'BREAK': op_break,
+        'CLEARS': op_clears,
+        'ADDS': op_adds,
+        'SUBS': op_subs,
+        'MULS': op_muls,
+        'IDIVS': op_idivs,
+        'LTS': op_lts,
+        'GTS': op_gts,
+        'EQS': op_eqs,
+        'ANDS': op_ands,
+        'ORS': op_ors,
+        'NOTS': op_nots,
+        'INT2CHARS': op_int2chars,
+        'STRI2INTS': op_stri2ints,
+        'JUMPIFEQS': op_jumpifeqs,
+        'JUMPIFNEQS': op_jumpifneqs,
+    }
+
+    jumps = ('CALL', 'JUMP', 'JUMPIFEQ', 'JUMPIFNEQ', 'JUMPIFEQS', 'JUMPIFNEQS')  # opcodes with label operand
+
+    # kinds of operands expected by each opcode, checked once by Read_source.verify
+    signatures = {
+        'MOVE': ('var', 'symb'),
+        'CREATEFRAME': (),
+        'POPFRAME': (),
+        'PUSHFRAME': (),
+        'DEFVAR': ('var',),
+        'CALL': ('label',),
+        'RETURN': (),
+        'PUSHS': ('symb',),
+        'POPS': ('var',),
+        'ADD': ('var', 'symb', 'symb'),
+        'SUB': ('var', 'symb', 'symb'),
+        'MUL': ('var', 'symb', 'symb'),
+        'IDIV': ('var', 'symb', 'symb'),
+        'LT': ('var', 'symb', 'symb'),
+        'GT': ('var', 'symb', 'symb'),
+        'EQ': ('var', 'symb', 'symb'),
+        'AND': ('var', 'symb', 'symb'),
+        'OR': ('var', 'symb', 'symb'),
+        'NOT': ('var', 'symb'),
+        'INT2CHAR': ('var', 'symb'),
+        'STRI2INT': ('var', 'symb', 'symb'),
+        'READ': ('var', 'type'),
+        'WRITE': ('symb',),
+        'CONCAT': ('var', 'symb', 'symb'),
+        'STRLEN': ('var', 'symb'),
+        'GETCHAR': ('var', 'symb', 'symb'),
+        'SETCHAR': ('var', 'symb', 'symb'),
+        'TYPE': ('var', 'symb'),
+        'LABEL': ('label',),
+        'JUMP': ('label',),
+        'JUMPIFEQ': ('label', 'symb', 'symb'),
+        'JUMPIFNEQ': ('label', 'symb', 'symb'),
+        'EXIT': ('symb',),
+        'DPRINT': ('symb',),
+        'BREAK': (),
+        'CLEARS': (),
+        'ADDS': (),
+        'SUBS': (),
+        'MULS': (),
+        'IDIVS': (),
+        'LTS': (),
+        'GTS': (),
+        'EQS': (),
+        'ANDS': (),
+        'ORS': (),
+        'NOTS': (),
+        'INT2CHARS': (),
+        'STRI2INTS': (),
+        'JUMPIFEQS': ('label',),
+        'JUMPIFNEQS': ('label',),
+    }
+
+    def decode(self):
+        """binds the instruction to the handler of its opcode, returns the bound handler"""
+        handler = self.handlers.get(self.opcode.upper())
+        if handler is None:
+            raise InterpretError(32, "wrong opcode")
+
+        self.run = handler.__get__(self)
+        return self.run
+
+class Log:
+    """
+    diagnostic messages on stderr gated by verbosity level, error messages are not part of it
+    callers check the level before formatting a message, so disabled logging costs nothing,
+    tracing of executed instructions is bound while decoding and only when enabled
+    """
+    ERROR, INFO, DEBUG = 0, 1, 2
+    levels = {'error': ERROR, 'info': INFO, 'debug': DEBUG}
 
-                if int(value1) < 0 or int(value1) > 49:
-                    exit(57)
+    def __init__(self, level=ERROR, stream=None):
+        self.level = level
+        self.stream = stream if stream is not None else sys.stderr
 
-                sys.exit(int(value1))
+    def write(self, message):
+        """prints the message"""
+        print(message, file=self.stream)
 
-            case 'DPRINT':
-                self.expected = ['symb']
-                self.check_operands()
+    def traced(self, instruction):
+        """returns handler of the instruction that logs every execution of it"""
+        run = instruction.run
 
-                value1 = self.get_op_val(0)
-                print(value1, file=sys.stderr)
-                self.jumper.current += 1
+        def step(interp):
+            args = ' '.join(interp.frames.describe(operand) for operand in instruction.operands if operand is not None)
+            self.write(f"[{instruction.order}] {instruction.opcode.upper()} {args}")
+            run(interp)
 
-            case 'BREAK':
-                self.expected = []
-                self.check_operands()
-                self.jumper.current += 1
+        return step
 
-            case _:
-                print("wrong opcode", file=sys.stderr)
-                exit(32)
 
-class Interpreter:
-    """main class managing all the tasks in interpretatin"""
-    def __init__(self, source_file, input_file):
-        self.source_file = source_file
-        self.input_file = input_file
-        self.in_list = []
-        self.frames = Frames()
-        self.datastack = []
-        self.labels = []
+class Output:
+    """buffer of the program output (WRITE), written out once it reaches the limit and at the end"""
+    default_limit = 1 << 16
 
+    def __init__(self, stream, limit=default_limit):
+        self.stream = stream
+        self.limit = limit  # in characters, 0 writes out every WRITE
+        self.parts = []
+        self.size = 0
 
+    def write(self, text):
+        """adds text to the buffer"""
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.limit:
+            self.flush()
 
-    def main(self):
-        """managing the interpretation"""
-        jumper = Jumper()
-        xml = Read_source(jumper, self.source_file, self.input_file)
-        xml.load()
-        xml.check()
-        self.in_list = xml.fill_list()
+    def flush(self):
+        """writes the buffered text to the stream"""
+        if self.parts:
+            self.stream.write(''.join(self.parts))
+            self.parts = []
+            self.size = 0
+        self.stream.flush()
 
-        jumper.extract_labels(self.in_list)
 
-        while jumper.current < len(self.in_list):
+class Input:
+    """
+    lines read by READ, pulled one by one from the input file or stdin when READ needs them,
+    so the input is never held in memory as a whole, a list of lines can be given instead
+    the file is opened before the program runs, so a bad path ends it before any output
+    the end of input reads nil@nil for every type
+    """
+    buffer_size = 1 << 20  # read buffer of the input file in bytes
+    int_pattern = re.compile(r'-?[0-9]\d*')
+    bool_pattern = re.compile(r'true', re.IGNORECASE)
+
+    def __init__(self, source):
+        self.source = source  # path, list of lines or None for stdin
+        self.lines = None  # iterator over the lines, opened before the program runs
+        self.file = None
+
+    def open(self):
+        """starts reading the source"""
+        if self.source is None:
+            self.lines = iter(sys.stdin.readline, '')
+        elif isinstance(self.source, str):
+            self.file = open_file(self.source, 'r', buffering=self.buffer_size)
+            self.lines = iter(self.file)
+        else:
+            self.lines = iter(self.source)
+
+    def close(self):
+        """closes the input file, if it was opened, further READs read the end of input"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.lines = iter(())
+
+    def readline(self):
+        """returns next line without the line end, None at the end of input"""
+        if self.lines is None:
+            self.open()
+        line = next(self.lines, None)
+        if line is None:
+            self.close()
+            return None
+        return line[:-1] if line.endswith('\n') else line
+
+    def read(self, type_name):
+        """returns next line as typed value of the type, nil@nil at the end and for invalid int"""
+        line = self.readline()
+        if line is None:
+            return 'nil', NIL
+        if type_name == 'int':
+            if self.int_pattern.fullmatch(line):
+                return 'int', int(line)
+            return 'nil', NIL
+        if type_name == 'bool':
+            return 'bool', self.bool_pattern.fullmatch(line) is not None
+        return 'string', line
+
+
+class Stats:
+    """
+    execution statistics collected by Interpreter.run_profiled (--stats, like the STATI extension)
+    counts and times are kept per instruction position and summed up per opcode in the report
+    """
+    not_counted = ('LABEL', 'DPRINT', 'BREAK')  # not counted as executed instructions
+    groups = ('insts', 'hot', 'vars', 'stack', 'calls', 'profile')
+
+    def __init__(self, in_list, frames=None):
+        self.in_list = in_list
+        self.frames = frames  # CountingFrames for the vars group
+        self.counts = [0] * len(in_list)
+        self.times = [0.0] * len(in_list)
+        self.max_stack = 0
+        self.max_calls = 0
+
+    def insts(self):
+        """number of executed instructions"""
+        return sum(count for i, count in zip(self.in_list, self.counts)
+                   if i.opcode.upper() not in self.not_counted)
+
+    def hot(self):
+        """order of the most executed instruction, the smallest order wins a tie"""
+        hot = None
+        for i, count in zip(self.in_list, self.counts):
+            if count and i.opcode.upper() not in self.not_counted:
+                if hot is None or (-count, i.order) < (-hot[0], hot[1]):
+                    hot = (count, i.order)
+        return hot[1] if hot is not None else None
+
+    def opcodes(self):
+        """executions and total time of every executed opcode, the most expensive first"""
+        opcodes = {}
+        for i, count, spent in zip(self.in_list, self.counts, self.times):
+            if count:
+                entry = opcodes.setdefault(i.opcode.upper(), {'count': 0, 'time': 0.0})
+                entry['count'] += count
+                entry['time'] += spent
+        return dict(sorted(opcodes.items(), key=lambda item: -item[1]['time']))
+
+    def instructions(self):
+        """executions and total time of every executed instruction, the most expensive first"""
+        executed = [{'order': i.order, 'opcode': i.opcode.upper(), 'count': count, 'time': spent}
+                    for i, count, spent in zip(self.in_list, self.counts, self.times) if count]
+        return sorted(executed, key=lambda entry: -entry['time'])
+
+    def report(self, groups):
+        """returns requested groups of statistics"""
+        report = {}
+        for group in groups:
+            if group == 'insts':
+                report['insts'] = self.insts()
+            elif group == 'hot':
+                report['hot'] = self.hot()
+            elif group == 'vars':
+                report['vars'] = self.frames.max_count if self.frames is not None else 0
+            elif group == 'stack':
+                report['stack'] = self.max_stack
+            elif group == 'calls':
+                report['calls'] = self.max_calls
+            elif group == 'profile':
+                report['opcodes'] = self.opcodes()
+                report['instructions'] = self.instructions()
+        return report
+
+    @staticmethod
+    def writable(file):
+        """whether the report can be written to the file, checked before the interpretation"""
+        if os.path.isdir(file):
+            return False
+        if os.path.exists(file):
+            return os.access(file, os.W_OK)
+        return os.access(os.path.dirname(file) or '.', os.W_OK)
+
+    def write(self, file, groups):
+        """writes the report to the file, json for *.json, otherwise one value per line in the given order"""
+        report = self.report(groups or self.groups)
+        try:
+            f = open(file, 'w')
+        except OSError:
+            raise InterpretError(12, f"cannot write statistics to {file}")
+        with f:
+            if file.endswith('.json'):
+                json.dump(report, f, indent=2)
+                f.write('\n')
+                return
+
+            for name, value in report.items():
+                if name == 'opcodes':
+                    for opcode, entry in value.items():
+                        f.write(f"{opcode} {entry['count']} {entry['time']:.6f}\n")
+                elif name == 'instructions':
+                    for entry in value:
+                        f.write(f"{entry['order']} {entry['opcode']} {entry['count']} {entry['time']:.6f}\n")
+                else:
+                    f.write(f"{value if value is not None else ''}\n")
+
 
-            instruction = self.in_list[jumper.current]
-            if instruction is None:
+class ProgramCache:
+    """
+    on-disk cache of loaded and verified programs, so that a repeated run skips the xml entirely
+    an entry is keyed by sha256 of the source bytes and of the interpreter, its content is
+    the instruction list in marshal format, least recently used entries are evicted
+    once the directory grows over max_size bytes
+    """
+    format = 1
+    default_size = 64 << 20
+
+    def __init__(self, directory, max_size=default_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.interpreter = self.digest()
+
+    @staticmethod
+    def digest():
+        """sha256 of this file, a changed interpreter does not use programs cached by another one"""
+        with open(__file__, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def key(self, data):
+        """returns key of the program given by its source bytes"""
+        digest = hashlib.sha256(f"{VERSION}:{self.format}:{self.interpreter}:".encode())
+        digest.update(data)
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.ippc')
+
+    def load(self, key):
+        """returns (instruction list, global frame size, local frame size, labels) or None"""
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                program = self.unpack(f.read())
+            os.utime(path)  # mtime marks recent use for eviction
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+        return program
+
+    @classmethod
+    def pack(cls, in_list, glob_size, local_size, labels):
+        """returns the loaded program in marshal format"""
+        instructions = []
+        for i in in_list:
+            instructions.append((i.order, i.opcode, tuple(
+                (o.type, None if o.type == 'nil' else o.value, o.frame, o.slot) if o is not None else None
+                for o in i.operands)))
+
+        return marshal.dumps((cls.format, glob_size, local_size, labels, instructions))
+
+    @classmethod
+    def unpack(cls, data):
+        """returns program packed by pack() as (instruction list, global frame size, local frame size, labels),
+        None for other format"""
+        format, glob_size, local_size, labels, instructions = marshal.loads(data)
+        if format != cls.format:
+            return None
+
+        in_list = []
+        for order, opcode, operands in instructions:
+            in_list.append(Instruction(order, opcode, tuple(
+                cls.make_operand(*operand) if operand is not None else None for operand in operands)))
+        return in_list, glob_size, local_size, labels
+
+    @staticmethod
+    def make_operand(type, value, frame, slot):
+        """creates operand from its marshalled fields"""
+        if type == 'nil':
+            value = NIL
+        return Operand(type, value, frame, slot)
+
+    def store(self, key, in_list, glob_size, local_size, labels):
+        """stores the loaded program, failures only mean the program is not cached"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp = f"{self.path(key)}.{os.getpid()}.tmp"
+            with open(temp, 'wb') as f:
+                f.write(self.pack(in_list, glob_size, local_size, labels))
+            os.replace(temp, self.path(key))
+            self.evict()
+        except (OSError, ValueError):
+            pass
+
+    def evict(self):
+        """removes least recently used entries while the cache is over its size"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.ippc'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
                 break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+def compare_lt(type1, value1, type2, value2):
+    """result of LT, raises 53 for wrong types"""
+    if type1 != type2 or type1 == 'nil':
+        raise InterpretError(53)
+    return value1 < value2
+
+
+def compare_gt(type1, value1, type2, value2):
+    """result of GT, raises 53 for wrong types"""
+    if type1 != type2 or type1 == 'nil':
+        raise InterpretError(53)
+    return value1 > value2
+
+
+def compare_eq(type1, value1, type2, value2):
+    """result of EQ, raises 53 for wrong types"""
+    if type1 != type2 and type1 != 'nil' and type2 != 'nil':
+        raise InterpretError(53)
+    return type1 == type2 and value1 == value2
+
+
+class Optimizer:
+    """
+    optimization of the loaded program, turned off by --no-optimize
+    simplify() folds operations on constants to MOVE and removes unreachable instructions
+    and unused labels, it is done on the checked program, so it does not hide static errors,
+    operations that would fail at runtime are not folded
+    frequent sequences of instructions are replaced by fused steps doing the work of all of them
+    with one dispatch, the fused step is put at the index of the first instruction and continues
+    after the last one, so indices of labels and return addresses stay the same, the steps of the
+    other instructions are kept, the fused instructions do their reads, writes and checks
+    in the original order, so outputs and exit codes stay the same
+    """
+    comparisons = {'LT': compare_lt, 'GT': compare_gt, 'EQ': compare_eq}
+    foldable = ('ADD', 'SUB', 'MUL', 'IDIV', 'LT', 'GT', 'EQ', 'AND', 'OR', 'NOT', 'CONCAT', 'STRLEN')
+    terminators = ('JUMP', 'EXIT', 'RETURN')  # the next instruction is reachable only through a label
+
+    def __init__(self, in_list, labels):
+        self.in_list = in_list
+        # indices where the execution can continue other way than from the previous instruction
+        self.entries = {index + 1 for index in labels.values()}
+        self.entries.update(index + 1 for index, i in enumerate(in_list) if i.opcode.upper() == 'CALL')
+
+    @classmethod
+    def simplify(cls, in_list):
+        """returns the program with folded constants and without unreachable instructions and unused labels"""
+        in_list = [cls.fold(instruction) for instruction in in_list]
+        while True:
+            used = {i.operands[0].value for i in in_list if i.opcode.upper() in Instruction.jumps}
+            simplified = []
+            reachable = True
+            for instruction in in_list:
+                opcode = instruction.opcode.upper()
+                if opcode == 'LABEL':
+                    if instruction.operands[0].value not in used:
+                        continue
+                    reachable = True
+                if reachable:
+                    simplified.append(instruction)
+                    if opcode in cls.terminators:
+                        reachable = False
+
+            if len(simplified) == len(in_list):  # removed code may have been the only user of a label
+                return simplified
+            in_list = simplified
+
+    @staticmethod
+    def compact(in_list):
+        """renumbers slots of LF/TF variables to the names left in the program, returns size of their layout"""
+        operands = {id(operand): operand for instruction in in_list for operand in instruction.operands
+                    if operand is not None and operand.type == 'var' and operand.frame != 'GF'}
+        slots = {}
+        for operand in operands.values():
+            operand.slot = slots.setdefault(operand.slot, len(slots))
+        return len(slots)
+
+    @classmethod
+    def fold(cls, instruction):
+        """returns MOVE of the result if the instruction is operation on constants, otherwise the instruction"""
+        opcode = instruction.opcode.upper()
+        if opcode not in cls.foldable:
+            return instruction
+
+        var, *symbs = (operand for operand in instruction.operands if operand is not None)
+        if any(symb.type == 'var' for symb in symbs):
+            return instruction
+
+        try:
+            type, value = cls.evaluate(opcode, [symb.const for symb in symbs])
+        except InterpretError:  # the error is left for the runtime
+            return instruction
+        return Instruction(instruction.order, 'MOVE', (var, Operand(type, value, None), None))
+
+    @classmethod
+    def evaluate(cls, opcode, typed):
+        """result of the operation on typed values, raises InterpretError as the instruction would"""
+        if opcode in cls.comparisons:
+            return 'bool', cls.comparisons[opcode](*typed[0], *typed[1])
+
+        if opcode == 'NOT' or opcode == 'STRLEN':
+            type1, value1 = typed[0]
+            if type1 != ('bool' if opcode == 'NOT' else 'string'):
+                raise InterpretError(53)
+            return ('bool', not value1) if opcode == 'NOT' else ('int', len(value1))
+
+        (type1, value1), (type2, value2) = typed
+        if opcode in ('AND', 'OR'):
+            if type1 != 'bool' or type2 != 'bool':
+                raise InterpretError(53)
+            return 'bool', (value1 and value2) if opcode == 'AND' else (value1 or value2)
+
+        if opcode == 'CONCAT':
+            if type1 != 'string' or type2 != 'string':
+                raise InterpretError(53)
+            return 'string', value1 + value2
+
+        if type1 != 'int' or type2 != 'int':
+            raise InterpretError(53)
+        if opcode == 'ADD':
+            return 'int', value1 + value2
+        if opcode == 'SUB':
+            return 'int', value1 - value2
+        if opcode == 'MUL':
+            return 'int', value1 * value2
+        if value2 == 0:
+            raise InterpretError(57)
+        return 'int', value1 // value2
+
+    def fuse(self, steps):
+        """returns steps with fused sequences"""
+        steps = list(steps)
+        in_list = self.in_list
+        index = 0
+        while index < len(in_list):
+            first = in_list[index]
+            second = in_list[index + 1] if index + 1 < len(in_list) and index + 1 not in self.entries else None
+            step = self.fuse_pair(first, second) if second is not None else None
+            if step is not None:
+                steps[index] = step
+                index += 2
+                continue
+
+            step = self.fuse_single(first)
+            if step is not None:
+                steps[index] = step
+            index += 1
+        return steps
+
+    @staticmethod
+    def same_variable(operand1, operand2):
+        """whether both operands are the same variable"""
+        return (operand1.type == 'var' and operand2.type == 'var' and
+                operand1.frame == operand2.frame and operand1.slot == operand2.slot)
+
+    def fuse_pair(self, first, second):
+        """returns fused step of two consecutive instructions, None if they have no fused form"""
+        opcode1 = first.opcode.upper()
+        opcode2 = second.opcode.upper()
+
+        if opcode1 == 'DEFVAR' and opcode2 == 'MOVE':
+            return self.defvar_move(first.operands[0], *second.operands[:2])
+        if opcode1 == 'CREATEFRAME' and opcode2 == 'PUSHFRAME':
+            return self.createframe_pushframe
+        if opcode1 == 'PUSHS' and opcode2 == 'POPS':
+            return self.pushs_pops(first.operands[0], second.operands[0])
+
+        if opcode1 in self.comparisons and opcode2 in ('JUMPIFEQ', 'JUMPIFNEQ'):
+            label, symb1, symb2 = second.operands
+            if symb1.type == 'bool':
+                symb1, symb2 = symb2, symb1
+            if symb2.type == 'bool' and self.same_variable(first.operands[0], symb1):
+                return self.compare_jump(first, symb2.const[1] == (opcode2 == 'JUMPIFEQ'), label.slot)
+        return None
+
+    def fuse_single(self, instruction):
+        """returns specialized step of one instruction, None if it has no specialized form"""
+        if instruction.opcode.upper() == 'ADD':
+            var, symb1, symb2 = instruction.operands
+            if self.same_variable(var, symb1) and symb2.type == 'int':
+                return self.increment(var, symb2.value)
+        return None
+
+    @staticmethod
+    def defvar_move(defined, var, symb):
+        """DEFVAR <defined>, MOVE <var> <symb>"""
+        def step(interp):
+            frames = interp.frames
+            frames.define(defined)
+            frames.write(var, frames.read(symb))
+            interp.jumper.current += 2
+
+        return step
+
+    @staticmethod
+    def createframe_pushframe(interp):
+        """CREATEFRAME, PUSHFRAME"""
+        frames = interp.frames
+        frames.local.append(frames.new())
+        frames.temp = None
+        interp.jumper.current += 2
+
+    @staticmethod
+    def pushs_pops(symb, var):
+        """PUSHS <symb>, POPS <var>, the data stack ends as it was"""
+        def step(interp):
+            frames = interp.frames
+            frames.write(var, frames.read(symb))
+            interp.jumper.current += 2
+
+        return step
+
+    def compare_jump(self, first, jump_if, target):
+        """LT/GT/EQ <var> <symb> <symb>, JUMPIFEQ/JUMPIFNEQ <label> <var> bool@<value>
+
+        jumps when the result of the comparison equals jump_if
+        """
+        compare = self.comparisons[first.opcode.upper()]
+        var, symb1, symb2 = first.operands
+
+        def step(interp):
+            frames = interp.frames
+            result = compare(*frames.read(symb1), *frames.read(symb2))
+            frames.write(var, ('bool', result))
+
+            if result == jump_if:
+                interp.jumper.current = target
             else:
-                instruction.execute()
+                interp.jumper.current += 2
 
-class Read_source(Interpreter):
-    """helper class for interpret, it is in charge trnasformin xml to loist of instructions"""
-    def __init__(self, jumper, source_file, input_file):
-        super().__init__(source_file, input_file)
-        self.root = None
-        self.jumper = jumper
+        return step
 
+    @staticmethod
+    def increment(var, value):
+        """ADD <var> <var> int@<value>"""
+        def step(interp):
+            frames = interp.frames
+            type1, value1 = frames.read(var)
+            if type1 != 'int':
+                raise InterpretError(53)
+            frames.write(var, ('int', value1 + value))
+            interp.jumper.current += 1
 
-    def load(self):
-        """creates xml tree structure"""
-        if self.source_file is None:
-            try:
-                parser = ET.parse(sys.stdin)
-            except ET.ParseError:
-                print("error while reading xml", file=sys.stderr)
-                exit(31)
+        return step
+
+
+class Jit:
+    """
+    tiered execution of the optimized program, it is split to basic blocks by labels and jumps,
+    entries of the blocks are counted and a block entered threshold times is compiled
+    to a python function with variables resolved to their slots, operations inlined
+    and a jump to the start of the block turned to a loop
+    a variable is read from its frame to a python local once and written back when the compiled code
+    ends or calls a generic handler, its type is checked once and known after every inlined write
+    a compiled instruction checks its operands before it changes anything, when a check fails
+    (type, undefined variable, missing frame, zero divisor) the function ends at that instruction
+    and its generic step executes it, so errors and their codes come from the generic steps,
+    instructions without inlined form are compiled as calls of their generic handlers
+    string buffers (Frames) fail the type checks, values copied without a type check are checked
+    for them only in programs which can create them
+    """
+    default_threshold = 100
+    ends = Instruction.jumps + ('RETURN', 'EXIT')  # instructions changing the position, they end blocks
+    frame_changes = ('CREATEFRAME', 'PUSHFRAME', 'POPFRAME')
+    arithmetic = {'ADD': '+', 'SUB': '-', 'MUL': '*', 'IDIV': '//'}
+    comparisons = {'LT': '<', 'GT': '>', 'EQ': '=='}
+    types = ('int', 'string', 'bool', 'nil')  # of initialized variables
+
+    def __init__(self, in_list, steps, threshold=default_threshold):
+        self.in_list = in_list
+        self.steps = steps
+        self.threshold = threshold
+        self.start = None  # of the block being compiled
+        self.bound = set()  # locals with frames bound in the compiled code, 'lf' and 'tf'
+        self.cache = {}  # (frame, slot) of variables kept in locals: (local, frame local, possible types, changed)
+        self.buffers = any(i.opcode.upper() == 'SETCHAR' or
+                           (i.opcode.upper() == 'CONCAT' and Optimizer.same_variable(*i.operands[:2]))
+                           for i in in_list)
+
+    def blocks(self):
+        """returns (start, end) of basic blocks"""
+        leaders = {0}
+        for index, i in enumerate(self.in_list):
+            opcode = i.opcode.upper()
+            if opcode in self.ends:
+                leaders.add(index + 1)
+                if opcode in Instruction.jumps:
+                    leaders.add(i.operands[0].slot)
+
+        leaders = sorted(leader for leader in leaders if leader < len(self.in_list))
+        return list(zip(leaders, leaders[1:] + [len(self.in_list)]))
+
+    def install(self):
+        """puts counting steps at starts of the blocks"""
+        for start, end in self.blocks():
+            self.steps[start] = self.counter(start, end, self.steps[start])
+
+    def counter(self, start, end, step):
+        """returns step counting entries of the block, it compiles the block at the threshold"""
+        entries = 0
+
+        def count(interp):
+            nonlocal entries
+            entries += 1
+            if entries >= self.threshold:
+                compiled = self.compile(start, end, step)
+                self.steps[start] = compiled if compiled is not None else step
+            step(interp)
+
+        return count
+
+    def compile(self, start, end, step):
+        """returns python function executing the block, None if nothing in it can be inlined"""
+        function = self.function(start, end, 'block')
+        if function is None:
+            return None
+
+        source, generic = function
+        namespace = {'U': UNINITIALIZED, 'NIL': NIL, f"f{start}": step}
+        namespace.update((f"r{index}", self.in_list[index].run) for index in generic)
+        exec(compile(source, f"<block {start}-{end}>", 'exec'), namespace)
+        return namespace['block']
+
+    def function(self, start, end, name):
+        """returns source of python function executing the block and indices of instructions called
+        by their generic handlers r<index>, None if nothing in the block can be inlined
+
+        the function replaces the step f<start> at the start, so a check failing at the first
+        instruction continues by the replaced step
+        """
+        self.start = start
+        self.bound = set()
+        self.cache = {}
+        body = []
+        generic = []
+        for index in range(start, end):
+            instruction = self.in_list[index]
+            state = set(self.bound), dict(self.cache)
+            lines = self.instruction(instruction, index, start)
+            if lines is None:
+                self.bound, self.cache = state  # lines of the operands read so far are dropped
+                lines = self.generic(instruction, index)
+                generic.append(index)
+            body.append(f"# {instruction.order} {instruction.opcode.upper()}")
+            body.extend(lines)
+
+        if len(generic) == sum(1 for i in self.in_list[start:end] if i.opcode.upper() != 'LABEL'):
+            return None
+
+        if self.in_list[end - 1].opcode.upper() not in self.ends:
+            body.extend(self.flush() + [f"jumper.current = {end}", "return"])
+        source = '\n'.join([f"def {name}(interp):",
+                            '    frames = interp.frames',
+                            '    g = frames.glob',
+                            '    jumper = interp.jumper',
+                            '    ds = interp.datastack',
+                            '    out = interp.output.write',
+                            '    while True:'] + ['        ' + line for line in body]) + '\n'
+        return source, generic
+
+    def flush(self):
+        """lines writing the changed cached variables back to their frames"""
+        return [f"{frame}[{slot}] = {name}" for (_, slot), (name, frame, _, changed) in self.cache.items()
+                if changed]
+
+    def guard(self, condition, index):
+        """lines ending the compiled code before the instruction when the condition holds"""
+        if index == self.start:  # nothing is changed yet
+            return [f"if {condition}:", f"    jumper.current = {index}", f"    return f{index}(interp)"]
+        return ([f"if {condition}:"] + ['    ' + line for line in self.flush()] +
+                [f"    jumper.current = {index}", "    return"])
+
+    def generic(self, instruction, index):
+        """lines calling the generic handler of the instruction, it sees and may change any variable"""
+        opcode = instruction.opcode.upper()
+        lines = self.flush()
+        self.cache = {}
+        if opcode in self.frame_changes:
+            self.bound.clear()
+        if opcode in self.ends:
+            return lines + [f"jumper.current = {index}", f"r{index}(interp)", "return"]
+        return lines + [f"r{index}(interp)"]
+
+    def frame(self, operand, index, lines):
+        """name of the local with the frame of the variable, binds it on its first use"""
+        if operand.frame == 'GF':
+            return 'g'
+
+        if operand.frame == 'LF':
+            if 'lf' not in self.bound:
+                lines.extend(self.guard("not frames.local", index))
+                lines.append("lf = frames.local[-1]")
+                self.bound.add('lf')
+            return 'lf'
+
+        if 'tf' not in self.bound:
+            lines.append("tf = frames.temp")
+            lines.extend(self.guard("tf is None", index))
+            self.bound.add('tf')
+        return 'tf'
+
+    def local(self, operand):
+        """name of the local keeping the variable"""
+        return self.cache[(operand.frame, operand.slot)][0]
+
+    def known(self, operand):
+        """types the value of the operand may have at this point of the block"""
+        if operand.frame is None:
+            return operand.const[0],
+        return self.cache[(operand.frame, operand.slot)][2]
+
+    def symb(self, operand, index, lines, types=None):
+        """emits reading of the operand, returns expressions of its type and value, None when it cannot
+        have any of the expected types (None expects any initialized value)
+
+        a variable is read from its frame to a local once, later reads check only what is not known yet
+        """
+        if operand.frame is None:
+            type, value = operand.const
+            if types is not None and type not in types:
+                return None
+            return repr(type), 'NIL' if type == 'nil' else repr(value)
+
+        expected = types if types is not None else self.types
+        key = (operand.frame, operand.slot)
+        if key not in self.cache:
+            frame = self.frame(operand, index, lines)
+            name = f"{operand.frame.lower()}{operand.slot}"
+            lines.append(f"{name} = {frame}[{operand.slot}]")
+            if types is None and self.buffers:
+                lines.extend(self.guard(f"{name} is None or {name} is U or {name}[0] == 'buf'", index))
+            elif types is None:
+                lines.extend(self.guard(f"{name} is None or {name} is U", index))
+            elif len(types) == 1:
+                lines.extend(self.guard(f"{name} is None or {name}[0] != {types[0]!r}", index))
+            else:
+                lines.extend(self.guard(f"{name} is None or {name}[0] not in {types!r}", index))
+            self.cache[key] = (name, frame, expected, False)
+            return f"{name}[0]", f"{name}[1]"
+
+        name, frame, known, changed = self.cache[key]
+        narrowed = tuple(type for type in known if type in expected)
+        if not narrowed:
+            return None
+        if narrowed != known:
+            if len(expected) == 1:
+                lines.extend(self.guard(f"{name}[0] != {expected[0]!r}", index))
+            else:
+                lines.extend(self.guard(f"{name}[0] not in {expected!r}", index))
+            self.cache[key] = (name, frame, narrowed, changed)
+        return f"{name}[0]", f"{name}[1]"
+
+    def assign(self, operand, index, lines, value, types):
+        """emits writing of the value expression with given possible types to the variable,
+        the variable is kept in its local until the compiled code ends or calls a generic handler"""
+        key = (operand.frame, operand.slot)
+        if key in self.cache:
+            name, frame = self.cache[key][:2]
         else:
+            frame = self.frame(operand, index, lines)
+            lines.extend(self.guard(f"{frame}[{operand.slot}] is None", index))
+            name = f"{operand.frame.lower()}{operand.slot}"
+        lines.append(f"{name} = {value}")
+        self.cache[key] = (name, frame, types, True)
+
+    def branch(self, target, start):
+        """lines continuing at the target index"""
+        if target == start:
+            return self.flush() + ["continue"]
+        return self.flush() + [f"jumper.current = {target}", "return"]
+
+    def same_types(self, operands, index, lines, types):
+        """emits reading of two operands of the same type, returns their value expressions or None"""
+        symb1, symb2 = operands
+        if symb1.frame is None and symb2.frame is None:
+            return None
+        if symb1.frame is None or symb2.frame is None:
+            const = symb1 if symb1.frame is None else symb2
+            if const.const[0] not in types:
+                return None
+            types = (const.const[0],)
+
+        read1 = self.symb(symb1, index, lines, types)
+        read2 = self.symb(symb2, index, lines, types)
+        if read1 is None or read2 is None:
+            return None
+        known1, known2 = self.known(symb1), self.known(symb2)
+        if len(known1) == 1 and len(known2) == 1:
+            if known1 != known2:
+                return None
+        else:
+            lines.extend(self.guard(f"{read1[0]} != {read2[0]}", index))
+        return read1[1], read2[1]
+
+    def instruction(self, instruction, index, start):
+        """returns lines of inlined instruction, None when it has no inlined form"""
+        opcode = instruction.opcode.upper()
+        operands = instruction.operands
+        lines = []
+
+        if opcode == 'LABEL':
+            return lines
+
+        if opcode == 'MOVE':
+            read = self.symb(operands[1], index, lines)
+            value = f"({read[0]}, {read[1]})" if operands[1].frame is None else self.local(operands[1])
+            self.assign(operands[0], index, lines, value, self.known(operands[1]))
+            return lines
+
+        if opcode == 'DEFVAR':
+            if (operands[0].frame, operands[0].slot) in self.cache:  # defined already, the generic step fails
+                return None
+            slot = f"{self.frame(operands[0], index, lines)}[{operands[0].slot}]"
+            lines.extend(self.guard(f"{slot} is not None", index))
+            lines.append(f"{slot} = U")
+            return lines
+
+        if opcode in self.arithmetic:
+            read1 = self.symb(operands[1], index, lines, ('int',))
+            read2 = self.symb(operands[2], index, lines, ('int',))
+            if read1 is None or read2 is None:
+                return None
+            if opcode == 'IDIV':
+                if operands[2].frame is None and operands[2].const[1] == 0:
+                    return None
+                lines.extend(self.guard(f"{read2[1]} == 0", index))
+            self.assign(operands[0], index, lines, f"('int', {read1[1]} {self.arithmetic[opcode]} {read2[1]})",
+                        ('int',))
+            return lines
+
+        if opcode in self.comparisons:
+            values = self.same_types(operands[1:], index, lines, ('int', 'string', 'bool'))
+            if values is None:
+                return None
+            self.assign(operands[0], index, lines, f"('bool', {values[0]} {self.comparisons[opcode]} {values[1]})",
+                        ('bool',))
+            return lines
+
+        if opcode in ('AND', 'OR'):
+            read1 = self.symb(operands[1], index, lines, ('bool',))
+            read2 = self.symb(operands[2], index, lines, ('bool',))
+            if read1 is None or read2 is None:
+                return None
+            self.assign(operands[0], index, lines, f"('bool', {read1[1]} {opcode.lower()} {read2[1]})", ('bool',))
+            return lines
+
+        if opcode == 'NOT' or opcode == 'STRLEN':
+            types = ('bool',) if opcode == 'NOT' else ('string', 'buf') if self.buffers else ('string',)
+            read = self.symb(operands[1], index, lines, types)
+            if read is None:
+                return None
+            if opcode == 'NOT':
+                self.assign(operands[0], index, lines, f"('bool', not {read[1]})", ('bool',))
+            else:
+                self.assign(operands[0], index, lines, f"('int', len({read[1]}))", ('int',))
+            return lines
+
+        if opcode == 'CONCAT':
+            if Optimizer.same_variable(*operands[:2]):  # appending, the generic step extends the buffer
+                return None
+            read1 = self.symb(operands[1], index, lines, ('string',))
+            read2 = self.symb(operands[2], index, lines, ('string',))
+            if read1 is None or read2 is None:
+                return None
+            self.assign(operands[0], index, lines, f"('string', {read1[1]} + {read2[1]})", ('string',))
+            return lines
+
+        if opcode == 'WRITE':
+            if operands[0].frame is None:
+                return None
+            read = self.symb(operands[0], index, lines)
+            writes = {'string': f"out({read[1]})", 'int': f"out(str({read[1]}))",
+                      'bool': f"out('true' if {read[1]} else 'false')"}
+            known = self.known(operands[0])
+            if len(known) == 1:  # nil writes nothing
+                lines.extend(writes[type] for type in known if type in writes)
+                return lines
+            keyword = 'if'
+            for type in known:
+                if type in writes:
+                    lines.extend((f"{keyword} {read[0]} == {type!r}:", '    ' + writes[type]))
+                    keyword = 'elif'
+            return lines
+
+        if opcode == 'PUSHS':
+            read = self.symb(operands[0], index, lines)
+            value = f"({read[0]}, {read[1]})" if operands[0].frame is None else self.local(operands[0])
+            lines.append(f"ds.append({value})")
+            return lines
+
+        if opcode == 'POPS':
+            lines.extend(self.guard("not ds", index))
+            self.assign(operands[0], index, lines, "ds.pop()", self.types)
+            return lines
+
+        if opcode == 'JUMP':
+            return self.branch(operands[0].slot, start)
+
+        if opcode in ('JUMPIFEQ', 'JUMPIFNEQ'):
+            values = self.same_types(operands[1:], index, lines, ('int', 'string', 'bool'))
+            if values is None:
+                return None
+            lines.append(f"if {values[0]} {'==' if opcode == 'JUMPIFEQ' else '!='} {values[1]}:")
+            lines.extend('    ' + line for line in self.branch(operands[0].slot, start))
+            lines.extend(self.branch(index + 1, start))
+            return lines
+
+        return None
+
+
+class Transpiler:
+    """
+    ahead of time translation of the whole optimized program to a python module (--emit-python),
+    every basic block is a function generated by Jit, the module holds the program in marshal format
+    the module is not standalone, it imports interpret.py as its runtime (it has to be importable),
+    unpacks and decodes the program on import and runs it by the dispatch loop of the interpreter,
+    the labels and CALL/RETURN stay jumps between the blocks, so exit codes come from the same code
+    what it saves is reading and checking the xml, optimizing and compiling the blocks
+    with --aot the module is kept next to the source as <source>.py, later runs import it with its
+    .pyc, it is generated again when the source or the interpreter changes, when it cannot be written
+    the program is just interpreted
+    """
+    def __init__(self, interp):
+        self.interp = interp
+
+    @staticmethod
+    def key(data):
+        """key of the module translated from the source bytes by this interpreter"""
+        digest = hashlib.sha256(f"{VERSION}:{ProgramCache.digest()}:".encode())
+        digest.update(data)
+        return digest.hexdigest()
+
+    def source(self, key=None, name='program'):
+        """returns source of the module with the loaded program"""
+        interp = self.interp
+        jit = Jit(interp.in_list, None)
+        program = ProgramCache.pack(*interp.program())
+        lines = ['"""',
+                 f"IPPcode23 program {name} translated by interpret.py --emit-python, do not edit",
+                 'interpret.py is its runtime and has to be importable (next to the module or on PYTHONPATH),',
+                 'run it as python <module> [--input file]',
+                 '"""',
+                 'import sys',
+                 'import interpret',
+                 'from interpret import UNINITIALIZED as U, NIL',
+                 '',
+                 f"KEY = {key!r}",
+                 f"PROGRAM = {program!r}",
+                 '',
+                 'in_list, glob_size, local_size, labels = interpret.ProgramCache.unpack(PROGRAM)',
+                 'steps = interpret.Optimizer(in_list, labels).fuse([instruction.decode() for instruction in in_list])',
+                 '']
+
+        blocks = []
+        generic = set()
+        for start, end in jit.blocks():
+            function = jit.function(start, end, f"block_{start}")
+            if function is not None:
+                blocks.append(start)
+                generic.update(function[1])
+                lines += ['', function[0]]
+
+        lines += [''] + [f"r{index} = in_list[{index}].run" for index in sorted(generic)]
+        lines += [f"f{start}, steps[{start}] = steps[{start}], block_{start}" for start in blocks]
+        lines += ['', '', "if __name__ == '__main__':",
+                  '    sys.exit(interpret.main(sys.argv[1:], sys.modules[__name__]))', '']
+        return '\n'.join(lines)
+
+    def write(self, path, key=None):
+        """writes the module and its .pyc, the module replaces the previous one at once, raises OSError"""
+        name = os.path.basename(self.interp.source_file) if isinstance(self.interp.source_file, str) else 'stdin'
+        temp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp, 'w') as f:
+                f.write(self.source(key, name))
+            py_compile.compile(temp, cfile=importlib.util.cache_from_source(path), dfile=path, doraise=True)
+            os.replace(temp, path)
+        except py_compile.PyCompileError as error:
+            raise OSError(str(error))
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+
+    @staticmethod
+    def import_module(path):
+        """imports the module from the path, python compiles it to .pyc once"""
+        spec = importlib.util.spec_from_file_location("program", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
 
+    def load(self):
+        """loads the program from the module next to the source, translates it first when missing or stale"""
+        interp = self.interp
+        path = interp.source_file + '.py'
+        with open_file(interp.source_file) as f:
+            key = self.key(f.read())
+
+        module = None
+        if os.path.isfile(path):
             try:
-                parser = ET.parse(str(self.source_file))
-            except ET.ParseError:
-                print("error while reading xml here ", file=sys.stderr)
-                exit(31)
+                module = self.import_module(path)
+            except Exception:  # damaged module is translated again
+                module = None
+        if module is None or getattr(module, 'KEY', None) != key:
+            interp.read_program()
+            interp.simplify()
+            try:
+                self.write(path, key)
+            except OSError:  # like a miss of ProgramCache, the program is interpreted without the module
+                if interp.log.level >= Log.INFO:
+                    interp.log.write(f"cannot write translated program {path}")
+                return
+            module = self.import_module(path)
+        elif interp.log.level >= Log.INFO:
+            interp.log.write(f"loaded translated program {path}")
+        interp.set_module(module)
 
-        self.root = parser.getroot()
 
-        return self.root
+class Interpreter:
+    """main class managing all the tasks in interpretatin"""
+    def __init__(self, source_file, input_file, output_buffer=Output.default_limit, log_level=Log.ERROR,
+                 stats_file=None, stats_groups=None, cache=None, stdout=None, stderr=None, optimize=True,
+                 jit=Jit.default_threshold, aot=False, module=None):
+        self.source_file = source_file  # path, source bytes or None for stdin
+        self.input_file = input_file  # path of input file, list of input lines or None for stdin
+        self.input = Input(input_file)
+        self.stderr = stderr if stderr is not None else sys.stderr
+        self.output = Output(stdout if stdout is not None else sys.stdout, output_buffer)
+        self.log = Log(log_level, self.stderr)
+        self.stats_file = stats_file
+        self.stats_groups = stats_groups
+        self.cache = cache
+        self.optimize = optimize
+        self.jit = jit  # threshold of block entries for compiling, None or 0 turns it off
+        self.aot = aot  # run the program translated by Transpiler next to the source
+        self.module = module  # program translated by Transpiler
+        self.in_list = []
+        self.glob_size = 0
+        self.local_size = 0
+        self.frames = Frames()
+        self.datastack = []  # typed values, the top is the last item
+        self.jumper = Jumper()
 
-    def check(self):
-        """basick check of xml structure"""
+    def load(self):
+        """loads and checks the program, simplified by Optimizer when optimizing"""
+        if self.module is not None:
+            self.set_module(self.module)
+            return
+        if self.aot and self.optimized() and isinstance(self.source_file, str):
+            Transpiler(self).load()
+            return
+
+        self.read_program()
+        self.simplify()
+
+    def simplify(self):
+        """simplifies the read program by Optimizer when optimizing"""
+        if self.optimized():
+            jumper = Jumper()
+            in_list = Optimizer.simplify(self.in_list)
+            jumper.extract_labels(in_list)
+            if self.log.level >= Log.INFO:
+                self.log.write(f"optimized to {len(in_list)} instructions")
+            self.set_program(in_list, self.glob_size, Optimizer.compact(in_list), jumper.labels)
+
+    def optimized(self):
+        """whether the program is optimized, statistics and traces describe the program as written"""
+        return self.optimize and self.stats_file is None and self.log.level < Log.DEBUG
+
+    def read_program(self):
+        """reads and checks the program, from the cache of programs if there is one"""
+        source = None
+        if isinstance(self.source_file, (bytes, bytearray)):
+            source = io.BytesIO(self.source_file)
+
+        if self.cache is not None:
+            if isinstance(self.source_file, (bytes, bytearray)):
+                data = bytes(self.source_file)
+            elif self.source_file is None:
+                data = sys.stdin.buffer.read()
+            else:
+                with open_file(self.source_file) as f:
+                    data = f.read()
+            key = self.cache.key(data)
+            program = self.cache.load(key)
+            if program is not None:
+                self.set_program(*program)
+                if self.log.level >= Log.INFO:
+                    self.log.write(f"loaded {len(self.in_list)} instructions from cache {key}")
+                return
+            source = io.BytesIO(data)
+
+        xml = Read_source(self.source_file, self.input_file)
+        in_list = xml.load(source)
+        xml.verify(in_list)
+        jumper = Jumper()
+        jumper.extract_labels(in_list)
+        self.set_program(in_list, len(xml.glob_slots), len(xml.local_slots), jumper.labels)
+        if self.log.level >= Log.INFO:
+            self.log.write(f"loaded {len(self.in_list)} instructions, {len(xml.glob_slots)} global "
+                           f"and {len(xml.local_slots)} local variable names")
+
+        if self.cache is not None:
+            self.cache.store(key, *self.program())
+
+    def set_program(self, in_list, glob_size, local_size, labels):
+        """takes loaded program, the runtime state is made fresh for it"""
+        self.in_list = in_list
+        self.glob_size = glob_size
+        self.local_size = local_size
+        self.jumper.labels = labels
+        self.jumper.bind_labels(in_list)
+        self.reset(self.input_file, self.output.stream)
+
+    def emit(self, path):
+        """translates the program to python module in the path (--emit-python)"""
+        self.read_program()
+        self.simplify()
+        key = None
+        if isinstance(self.source_file, str):
+            with open_file(self.source_file) as f:
+                key = Transpiler.key(f.read())
+        try:
+            Transpiler(self).write(path, key)
+        except OSError:
+            raise InterpretError(12, f"cannot write {path}")
+
+    def set_module(self, module):
+        """takes the program translated by Transpiler"""
+        self.set_program(module.in_list, module.glob_size, module.local_size, module.labels)
+        self.module = module
+
+    def program(self):
+        """returns the loaded program as (instruction list, global frame size, local frame size, labels)"""
+        return self.in_list, self.glob_size, self.local_size, self.jumper.labels
+
+    def reset(self, input_file, stdout):
+        """fresh runtime state (frames, stacks, position, output) for another run of the loaded program"""
+        self.input.close()
+        self.input_file = input_file
+        self.input = Input(input_file)
+        self.output = Output(stdout, self.output.limit)
+        counting = self.stats_file is not None and (not self.stats_groups or 'vars' in self.stats_groups)
+        self.frames = (CountingFrames if counting else Frames)(self.glob_size, self.local_size)
+        self.datastack = []
+        labels = self.jumper.labels
+        self.jumper = Jumper()
+        self.jumper.labels = labels
+
+    def main(self):
+        """managing the interpretation, returns the exit code"""
+        return self.guarded(self.interpret)
 
+    def guarded(self, action):
+        """calls the action, returns exit code of it, the message of an error is printed on stderr"""
         try:
-            if self.root.attrib['language'].upper() != "IPPcode23".upper():  # name a description nekotroluju kdyz
-                print("error while reading xml", file=sys.stderr)
-                exit(32)
-        except KeyError:
-            print("error while reading xml v hlavicce", file=sys.stderr)
-            exit(31)
-
-        for child in self.root:
-            if child.tag != 'instruction':
-                print("chyba v xml", file=sys.stderr)
-                exit(32)
-
-            child_at = child.attrib
-            if len(child_at) != 2 or ('opcode' not in child_at or 'order' not in child_at):
-                print("chyba v xml", file=sys.stderr)
-                exit(32)
-
-            if not re.match(r'^[1-9]\d*$', child.attrib['order']):
-                print("negative order", file=sys.stderr)
-                exit(32)
-
-            for number, arg in enumerate(child, 1):
-                try:
-                    if not re.match('^arg[123]$', arg.tag) or number > 3:
-                        print("spatny argument", file=sys.stderr)
-                        exit(32)
-                except KeyError:
-                    print("error while checking arguments", file=sys.stderr)
-                    exit(31)
-
-    def fill_list(self):
-        """creates a list of instructions for further processing in interpret"""
-        instruction_list = []
-        for child in self.root:
-
-            opcode = child.attrib['opcode']
-            operands = [None] * 3
-            order = int(child.attrib['order'])
-            for i, subchild in enumerate(child, 1):
-                if subchild.tag == 'arg1':
-                    if subchild.attrib['type'] == 'var':
-                        if '@' in subchild.text:
-                            frame, value = subchild.text.split('@')
-                        else:
-                            # Handle the case when '@' is not found, e.g. assign default values
-                            frame = None
-                            value = None
-                        operands[0] = Operand(subchild.attrib['type'], value, frame)
-                    else:
-                        operands[0] = Operand(subchild.attrib['type'], subchild.text, None)
-
-                elif subchild.tag == 'arg2':
-                    if subchild.attrib['type'] == 'var':
-                        if '@' in subchild.text:
-                            frame, value = subchild.text.split('@')
-                        else:
-                            # Handle the case when '@' is not found, e.g. assign default values
-                            frame = None
-                            value = None
-                        operands[1] = Operand(subchild.attrib['type'], value, frame)
-                    else:
-                        operands[1] = Operand(subchild.attrib['type'], subchild.text, None)
-                elif subchild.tag == 'arg3':
-                    if subchild.attrib['type'] == 'var':
-                        if '@' in subchild.text:
-                            frame, value = subchild.text.split('@')
-                        else:
-                            # Handle the case when '@' is not found, e.g. assign default values
-                            frame = None
-                            value = None
-                        operands[2] = Operand(subchild.attrib['type'], value, frame)
-                    else:
-                        operands[2] = Operand(subchild.attrib['type'], subchild.text, None)
-                else:
-                    print("error while loading operands", file=sys.stderr)
-                    exit(31)
+            action()
+        except InterpretError as error:
+            if error.message:
+                print(error.message, file=self.stderr)
+            return error.code
+        return 0
+
+    def interpret(self):
+        """loads and executes the program, ends by InterpretError on EXIT and on errors"""
+        self.load()
+        self.execute()
 
-            new_int = Instruction(order, opcode, operands, self.frames, self.labels, self.input_file,
-                                  self.datastack, self.jumper, self.input_file)
-            instruction_list.append(new_int)
+    def execute(self):
+        """executes the loaded program"""
+        jumper = self.jumper
+        self.input.open()  # a bad input file ends the run before the program writes anything
+
+        # decode stage, every instruction gets bound to its handler only once
+        steps = [instruction.decode() for instruction in self.in_list]
+        if self.module is not None and self.optimized():
+            steps = self.module.steps
+        elif self.log.level >= Log.DEBUG:
+            steps = [self.log.traced(instruction) for instruction in self.in_list]
+        elif self.optimized():
+            steps = Optimizer(self.in_list, jumper.labels).fuse(steps)
+            if self.jit:
+                Jit(self.in_list, steps, self.jit).install()
+        count = len(steps)
+
+        if self.stats_file is not None:
+            stats = Stats(self.in_list, self.frames if isinstance(self.frames, CountingFrames) else None)
+            try:
+                self.run_profiled(steps, stats)
+            finally:
+                self.output.flush()
+                self.input.close()
+                stats.write(self.stats_file, self.stats_groups)
+            return
 
-            order_arr = []
-            for i in instruction_list:
-                if i.order not in order_arr:
-                    order_arr.append(i.order)
-                else:
-                    print("duplicate order", file=sys.stderr)
-                    exit(32)
+        try:
+            while jumper.current < count:
+                steps[jumper.current](self)
+        finally:
+            # normal end, EXIT and errors (InterpretError) alike
+            self.output.flush()
+            self.input.close()
+
+    def run_profiled(self, steps, stats):
+        """main loop of interpretation collecting statistics, kept apart so that the plain loop costs nothing"""
+        jumper = self.jumper
+        datastack = self.datastack
+        counts = stats.counts
+        times = stats.times
+        clock = time.perf_counter
+        count = len(steps)
+
+        while jumper.current < count:
+            index = jumper.current
+            counts[index] += 1
+            start = clock()
+            steps[index](self)
+            times[index] += clock() - start
+
+            if len(datastack) > stats.max_stack:
+                stats.max_stack = len(datastack)
+            if len(jumper.jump_back) > stats.max_calls:
+                stats.max_calls = len(jumper.jump_back)
 
-            instruction_list = sorted(instruction_list, key=lambda x: x.order, reverse=False)
+class Read_source(Interpreter):
+    """helper class for interpret, it is in charge trnasformin xml to loist of instructions"""
+    order_pattern = re.compile(r'^[1-9]\d*$')
 
-        right_order = 0
-        for j in instruction_list:
-            j.order = right_order
-            right_order += 1
+    def __init__(self, source_file, input_file):
+        super().__init__(source_file, input_file)
+        self.root = None
+        self.error = None
+        self.glob_slots = {}  # names of global variables and their slots
+        self.local_slots = {}  # layout of local and temporary frames
+
+    def load(self, source=None):
+        """streams the xml source, checks it and creates list of instructions in one pass
+
+        elements are dropped as soon as their instruction is created, so the whole xml tree
+        is never held in memory, structural errors are reported only after the whole source
+        was read, so malformed xml (31) takes precedence as when the tree was parsed at once
+        """
+        opened = None
+        if source is None:  # file like object with the source can be given instead of reading source_file
+            source = sys.stdin.buffer if self.source_file is None else open_file(self.source_file)
+            opened = source if self.source_file is not None else None
+        instruction_list = []
+        orders = set()
+        self.error = None
+        depth = 0
+        try:
+            for event, element in ET.iterparse(source, events=('start', 'end')):
+                if event == 'start':
+                    if depth == 0:
+                        self.root = element
+                        self.check_root()
+                    depth += 1
+                    continue
+
+                depth -= 1
+                if depth == 1:  # child of the root element is complete
+                    if self.error is None:
+                        instruction = self.make_instruction(element, orders)
+                        if instruction is not None:
+                            instruction_list.append(instruction)
+                    del self.root[:]
+        except ET.ParseError:
+            raise InterpretError(31, "error while reading xml")
+        finally:
+            if opened is not None:
+                opened.close()
+
+        if self.error is not None:
+            raise InterpretError(*self.error)
+
+        instruction_list.sort(key=lambda x: x.order)  # order keeps the xml value, jumps use list indices
 
         return instruction_list
 
+    def fail(self, code, message):
+        """remembers the first error found in the xml structure"""
+        if self.error is None:
+            self.error = (code, message)
+
+    def check_root(self):
+        """basick check of xml header"""
+        language = self.root.attrib.get('language')
+        if language is None:
+            self.fail(31, "error while reading xml v hlavicce")
+        elif language.upper() != "IPPcode23".upper():  # name a description nekotroluju kdyz
+            self.fail(32, "error while reading xml")
+
+    def make_instruction(self, child, orders):
+        """checks one instruction element and creates instruction from it"""
+        if child.tag != 'instruction':
+            self.fail(32, "chyba v xml")
+            return None
+
+        child_at = child.attrib
+        if len(child_at) != 2 or ('opcode' not in child_at or 'order' not in child_at):
+            self.fail(32, "chyba v xml")
+            return None
+
+        if not self.order_pattern.match(child_at['order']):
+            self.fail(32, "negative order")
+            return None
+
+        order = int(child_at['order'])
+        if order in orders:
+            self.fail(32, "duplicate order")
+            return None
+        orders.add(order)
+
+        operands = [None] * 3
+        for number, arg in enumerate(child, 1):
+            if arg.tag not in ('arg1', 'arg2', 'arg3') or number > 3:
+                self.fail(32, "spatny argument")
+                return None
+            operand = self.make_operand(arg)
+            if operand is None:
+                return None
+            operands[int(arg.tag[3]) - 1] = operand
+
+        return Instruction(order, child_at['opcode'], tuple(operands))
+
+    def make_operand(self, arg):
+        """creates operand from xml element, constants are decoded to their python values, None for wrong literal"""
+        type = arg.attrib.get('type')
+        text = arg.text
+        if type == 'var':
+            if text is not None and '@' in text:
+                frame, value = text.strip().split('@', 1)
+            else:
+                frame = None
+                value = None
+            slots = self.glob_slots if frame == 'GF' else self.local_slots
+            return Operand(type, value, frame, slots.setdefault(value, len(slots)))
+
+        if type in ('int', 'bool', 'string', 'nil'):
+            value = self.decode_literal(type, text)
+            return Operand(type, value, None) if value is not None else None
+
+        return Operand(type, text.strip() if text is not None else None, None)
+
+    def decode_literal(self, type, text):
+        """returns python value of IPPcode23 constant, None when it is wrong"""
+        if type == 'string':
+            if text is None:
+                return ''
+            return replace_unicode_escape_sequences(text)
+
+        text = text.strip() if text is not None else ''
+        if type == 'int':
+            try:
+                return int(text)
+            except ValueError:
+                pass
+            try:
+                return int(text, 0)
+            except ValueError:
+                self.fail(32, "wrong int literal")
+                return None
+
+        if type == 'bool' and text in ('true', 'false'):
+            return text == 'true'
+
+        if type == 'nil' and text == 'nil':
+            return NIL
+
+        self.fail(32, "wrong literal")
+        return None
+
+    def verify(self, instruction_list):
+        """static check of opcodes and operands of the whole program, done once before interpretation"""
+        for instruction in instruction_list:
+            kinds = Instruction.signatures.get(instruction.opcode.upper())
+            if kinds is None:
+                raise InterpretError(32, "wrong opcode")
+
+            operands = instruction.operands
+            for number, operand in enumerate(operands):
+                if (operand is None) != (number >= len(kinds)):
+                    raise InterpretError(32, "wrong operand count")
+
+            for operand, kind in zip(operands, kinds):
+                self.verify_operand(operand, kind)
+
+    def verify_operand(self, operand, kind):
+        """checks lexical form of an operand and whether its type fits the kind expected by the opcode"""
+        if operand.type == 'var':
+            if operand.frame not in ('GF', 'LF', 'TF') or not operand.value:
+                raise InterpretError(32, "wrong variable")
+            if kind != 'var' and kind != 'symb':
+                raise InterpretError(53, "wrong operand type")
+
+        elif operand.type in ('int', 'bool', 'string', 'nil'):
+            if kind != 'symb':
+                raise InterpretError(53, "wrong operand type")
+
+        elif operand.type == 'label' or operand.type == 'type':
+            if kind != operand.type:
+                raise InterpretError(53, "wrong operand type")
+
+        else:
+            raise InterpretError(32, "unknown operand type")
+
 
 class Jumper:
     """class is in charge of keeping the data about flow control"""
     def __init__(self):
         self.current = 0
-        self.jump_back = []
+        self.jump_back = []  # call stack of return positions, the top is the last item
         self.labels = {}
-        self.input_index = 0
 
 
     def extract_labels(self, in_list):
-        for i in in_list:
+        """maps names of labels to positions of their instructions"""
+        for index, i in enumerate(in_list):
             if i.opcode.upper() == 'LABEL':
                 if i.operands[0].value not in self.labels:
-                    self.labels[i.operands[0].value] = i.order
+                    self.labels[i.operands[0].value] = index
                 else:
-                    print("label redefinition", file=sys.stderr)
-                    exit(52)
+                    raise InterpretError(52, "label redefinition")
+
+    def bind_labels(self, in_list):
+        """resolves labels of jumps to the index just past their LABEL, jump to undefined label is error 52"""
+        for i in in_list:
+            if i.opcode.upper() in Instruction.jumps:
+                index = self.labels.get(i.operands[0].value)
+                if index is None:
+                    raise InterpretError(52, "non existing label")
+                i.operands[0].slot = index + 1
 
 def replace_unicode_escape_sequences(s):
     """helper function for thansforming xml strings to it's real value"""
@@ -1188,40 +2396,312 @@ def replace_unicode_escape_sequences(s):
     return result
 
 
-"""Starting of the program and loading arguments """
+class Batch:
+    """
+    runs one program against many input files (--batch), the program is loaded and checked once
+    and sent to a pool of worker processes in marshal format, every input gets fresh frames,
+    stacks and output, its stdout and exit code are written to <name>.out and <name>.rc
+    in the output directory, so two inputs with the same name are rejected, an input which
+    cannot be opened gets exit code 11 or 12 in its .rc
+    """
+    worker = None  # interpreter of the worker process, created by start_worker
+
+    def __init__(self, interpreter, output_dir, jobs=None):
+        self.interpreter = interpreter
+        self.output_dir = output_dir
+        self.jobs = jobs or os.cpu_count() or 1
+
+    @staticmethod
+    def inputs(paths):
+        """input files given by paths, *.in files are taken from directories, a file given twice is run once"""
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                    if name.endswith('.in') and os.path.isfile(os.path.join(path, name))))
+            else:
+                files.append(path)
+        return list(dict.fromkeys(os.path.normpath(path) for path in files))
+
+    @staticmethod
+    def name(path):
+        """name of the outputs of input file, its basename without extension"""
+        return os.path.splitext(os.path.basename(path))[0]
+
+    @staticmethod
+    def duplicate(files):
+        """returns two input files whose outputs would overwrite each other, None when names are unique"""
+        seen = {}
+        for path in files:
+            other = seen.setdefault(Batch.name(path), path)
+            if other != path:
+                return other, path
+        return None
+
+    def run(self, paths):
+        """runs the program against all inputs, returns exit code of loading the program"""
+        interp = self.interpreter
+        code = interp.guarded(interp.load)
+        if code != 0:
+            return code
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        options = (interp.output.limit, interp.log.level, interp.optimize, interp.jit)
+        with concurrent.futures.ProcessPoolExecutor(self.jobs, initializer=Batch.start_worker,
+                                                    initargs=(ProgramCache.pack(*interp.program()), options)) as pool:
+            runs = [pool.submit(Batch.run_input, path, self.output_dir) for path in self.inputs(paths)]
+            for future in runs:
+                path, code = future.result()
+                if interp.log.level >= Log.INFO:
+                    interp.log.write(f"{path}: {code}")
+        return 0
+
+    @staticmethod
+    def start_worker(program, options):
+        """creates interpreter of the worker process with the packed program"""
+        output_buffer, log_level, optimize, jit = options
+        Batch.worker = Interpreter(None, None, output_buffer, log_level, optimize=optimize, jit=jit)
+        Batch.worker.set_program(*ProgramCache.unpack(program))
+
+    @staticmethod
+    def run_input(path, output_dir):
+        """runs the program of the worker against one input file, returns the path and the exit code"""
+        interp = Batch.worker
+        name = os.path.join(output_dir, Batch.name(path))
+        with open(name + '.out', 'w') as stdout:
+            interp.reset(path, stdout)
+            code = interp.guarded(interp.execute)
+
+        with open(name + '.rc', 'w') as f:
+            f.write(f"{code}\n")
+        return path, code
+
+
+class TestRunner:
+    """
+    runs test directories (--test) in the usual layout name.src, name.in, name.out, name.rc,
+    missing .in and .out are empty and missing .rc is 0, stdout is compared only for exit code 0,
+    tests are spread over a pool of one worker process per CPU and the summary lists them
+    with their times, the slowest first
+    differential run (--differential) compares stdout and exit code of every test with the plain
+    interpreter without optimizations instead of the .out and .rc files
+    """
+    def __init__(self, report_file=None, jobs=None, options=None, stream=None, differential=False):
+        self.report_file = report_file
+        self.jobs = jobs or os.cpu_count() or 1
+        self.options = options or {}  # keyword arguments of Interpreter
+        self.differential = differential
+        self.stream = stream if stream is not None else sys.stdout
+
+    @staticmethod
+    def tests(paths):
+        """names of tests (paths without .src) in given directories and their subdirectories"""
+        names = []
+        for path in paths:
+            if path.endswith('.src') and os.path.isfile(path):
+                names.append(path[:-4])
+                continue
+            for directory, _, files in os.walk(path):
+                names.extend(os.path.join(directory, name[:-4]) for name in files if name.endswith('.src'))
+        return sorted(names)
+
+    def run(self, paths):
+        """runs all tests, writes the summary, returns 0 when all passed"""
+        names = self.tests(paths)
+        start = time.perf_counter()
+        with concurrent.futures.ProcessPoolExecutor(self.jobs) as pool:
+            results = list(pool.map(TestRunner.run_test, names, [self.options] * len(names),
+                                    [self.differential] * len(names)))
+        total = time.perf_counter() - start
+
+        results.sort(key=lambda result: -result['time'])
+        failed = [result for result in results if result['status'] != 'ok']
+        print(f"passed {len(results) - len(failed)} of {len(results)} tests in {total:.2f} s", file=self.stream)
+        for result in failed:
+            print(f"{result['status'].upper()} {result['name']}: {result['detail']}", file=self.stream)
+
+        if self.report_file is not None:
+            self.write(self.report_file, results, total)
+        return 0 if not failed else 1
+
+    @staticmethod
+    def read(path, default):
+        """content of an optional file of the test"""
+        if not os.path.isfile(path):
+            return default
+        with open(path) as f:
+            return f.read()
+
+    @staticmethod
+    def run_test(name, options, differential=False):
+        """runs one test in the worker, returns its result"""
+        input_file = name + '.in' if os.path.isfile(name + '.in') else []  # no .in file is an empty input
+        stdout = io.StringIO()
+        start = time.perf_counter()
+        try:
+            if differential:
+                expected = io.StringIO()
+                expected_code = Interpreter(name + '.src', input_file, stdout=expected, stderr=io.StringIO(),
+                                            optimize=False, jit=0).main()
+                expected_output = expected.getvalue()
+                start = time.perf_counter()
+            else:
+                expected_output = TestRunner.read(name + '.out', '')
+                expected_code = int(TestRunner.read(name + '.rc', '0').strip() or 0)
+            code = Interpreter(name + '.src', input_file, stdout=stdout, stderr=io.StringIO(), **options).main()
+        except Exception as error:  # failure of the interpreter itself, not of the program
+            return {'name': name, 'status': 'crash', 'time': time.perf_counter() - start,
+                    'detail': f"{type(error).__name__}: {error}"}
+        spent = time.perf_counter() - start
+
+        if code != expected_code:
+            status, detail = 'fail', f"exit code {code}, expected {expected_code}"
+        elif (code == 0 or differential) and stdout.getvalue() != expected_output:
+            status, detail = 'fail', "stdout differs"
+        else:
+            status, detail = 'ok', ''
+        return {'name': name, 'status': status, 'time': spent, 'detail': detail}
+
+    def write(self, file, results, total):
+        """writes the summary to the file, json for *.json, otherwise one test per line"""
+        passed = sum(1 for result in results if result['status'] == 'ok')
+        with open(file, 'w') as f:
+            if file.endswith('.json'):
+                json.dump({'passed': passed, 'total': len(results), 'time': total, 'tests': results}, f, indent=2)
+                f.write('\n')
+                return
 
-parser = argparse.ArgumentParser(
-    prog='interpret.py',
-    description='Skript pro interpretaci xml reprezentace kódu IPPcode23',
-    epilog='Autor: Daniel Zarsky, xzarsk04')
-parser.add_argument('--source', action='store', dest='source_file', help='vstupní soubor s XML reprezentací')
-parser.add_argument('--input', action='store', dest='input_file',
-                    help='soubor se vstupy pro samotnou interpretaci')
-args = parser.parse_args()
+            f.write(f"passed {passed} of {len(results)} tests in {total:.6f} s\n")
+            for result in results:
+                f.write(f"{result['time']:.6f} {result['status']} {result['name']} {result['detail']}".rstrip() + '\n')
+
+
+def run(source, input_lines=None, stdout=None, stderr=None, **options):
+    """
+    interprets the program in-process and returns its exit code
+    source is a path or the xml bytes, input_lines the list of lines read by READ or path of the input file
+    (None reads stdin), options are the remaining keyword arguments of Interpreter
+    a source or input file which cannot be opened is exit code 11 (missing) or 12 as in main
+    """
+    return Interpreter(source, input_lines, stdout=stdout, stderr=stderr, **options).main()
+
+
+def main(argv=None, module=None):
+    """
+    Starting of the program and loading arguments, returns the exit code
+    module is the program translated by --emit-python, which is run instead of --source
+    """
+    parser = argparse.ArgumentParser(
+        prog='interpret.py',
+        description='Skript pro interpretaci xml reprezentace kódu IPPcode23',
+        epilog='Autor: Daniel Zarsky, xzarsk04')
+    parser.add_argument('--source', action='store', dest='source_file', help='vstupní soubor s XML reprezentací')
+    parser.add_argument('--input', action='store', dest='input_file',
+                        help='soubor se vstupy pro samotnou interpretaci')
+    parser.add_argument('--verbose', '-v', action='count', dest='verbose', default=0,
+                        help='diagnostické výpisy na stderr, -v průběh načítání, -vv každá vykonaná instrukce')
+    parser.add_argument('--log-level', action='store', dest='log_level', choices=Log.levels,
+                        help='úroveň diagnostických výpisů (error, info, debug), přebíjí --verbose')
+    parser.add_argument('--output-buffer', action='store', dest='output_buffer', type=int,
+                        default=Output.default_limit,
+                        help='velikost bufferu výstupu ve znacích, 0 vypisuje každý WRITE hned')
+    parser.add_argument('--stats', action='store', dest='stats_file',
+                        help='soubor pro statistiky interpretace (json pro příponu .json)')
+    for group, description in (('insts', 'počet vykonaných instrukcí'),
+                               ('hot', 'order nejčastěji vykonané instrukce'),
+                               ('vars', 'maximální počet inicializovaných proměnných'),
+                               ('stack', 'maximální hloubka datového zásobníku'),
+                               ('calls', 'maximální hloubka zásobníku volání'),
+                               ('profile', 'počty a časy vykonání jednotlivých opcode a instrukcí')):
+        parser.add_argument('--' + group, action='append_const', dest='stats_groups', const=group, help=description)
+    parser.add_argument('--cache-dir', action='store', dest='cache_dir',
+                        help='adresář cache načtených programů, opakované spuštění stejného programu přeskočí XML')
+    parser.add_argument('--cache-size', action='store', dest='cache_size', type=int,
+                        default=ProgramCache.default_size, help='maximální velikost cache v bajtech')
+    parser.add_argument('--batch', action='store', dest='batch', nargs='+',
+                        help='vstupní soubory nebo adresáře se soubory *.in, program se načte jednou '
+                             'a interpretuje se s každým z nich')
+    parser.add_argument('--batch-output', action='store', dest='batch_output',
+                        help='adresář pro výstupy (<jméno>.out) a návratové kódy (<jméno>.rc) dávky')
+    parser.add_argument('--jobs', '-j', action='store', dest='jobs', type=int,
+                        help='počet procesů dávky a testů, výchozí je počet CPU')
+    parser.add_argument('--no-optimize', action='store_false', dest='optimize',
+                        help='vypne optimalizaci načteného programu (spojování častých dvojic instrukcí)')
+    parser.add_argument('--jit-threshold', action='store', dest='jit', type=int, default=Jit.default_threshold,
+                        help='počet vstupů do základního bloku, po kterém se blok přeloží do pythonu')
+    parser.add_argument('--no-jit', action='store_const', dest='jit', const=0,
+                        help='vypne překlad často vykonávaných bloků do pythonu')
+    parser.add_argument('--emit-python', action='store', dest='emit_python',
+                        help='přeloží program do modulu pythonu a neinterpretuje ho, modul používá interpret.py '
+                             '(musí být importovatelný) a jeho smyčku, přeskočí jen načtení XML a optimalizace')
+    parser.add_argument('--aot', action='store_true', dest='aot',
+                        help='interpretuje program přeložený do modulu <zdroj>.py vedle zdrojového souboru, '
+                             'modul se vytvoří při prvním spuštění a po změně zdroje, když ho nelze zapsat, '
+                             'program se jen interpretuje')
+    parser.add_argument('--test', action='store', dest='test', nargs='+',
+                        help='adresáře s testy (.src, .in, .out, .rc), testy běží paralelně')
+    parser.add_argument('--differential', action='store_true', dest='differential',
+                        help='testy porovná s interpretací bez optimalizací místo souborů .out a .rc')
+    parser.add_argument('--test-report', action='store', dest='test_report',
+                        help='soubor pro souhrn testů s časy, nejpomalejší první (json pro příponu .json)')
+    args = parser.parse_args(argv)
+
+    if (args.batch is None) != (args.batch_output is None) or (args.batch is not None and args.input_file):
+        print("--batch needs --batch-output and no --input", file=sys.stderr)
+        return 10
+
+    if args.stats_groups and args.stats_file is None:
+        print("statistics groups need --stats", file=sys.stderr)
+        return 10
+
+    if args.stats_file is not None and not Stats.writable(args.stats_file):
+        print(f"cannot write statistics to {args.stats_file}", file=sys.stderr)
+        return 12
+
+    if (args.test_report is not None or args.differential) and args.test is None:
+        print("--test-report and --differential need --test", file=sys.stderr)
+        return 10
+
+    cache = ProgramCache(args.cache_dir, args.cache_size) if args.cache_dir is not None else None
+    if args.test is not None:
+        if not all(os.path.exists(path) for path in args.test):
+            return 11
+        options = {'cache': cache, 'optimize': args.optimize, 'jit': args.jit, 'aot': args.aot}
+        return TestRunner(args.test_report, args.jobs, options, differential=args.differential).run(args.test)
+
+    if args.source_file is None and args.input_file is None and args.batch is None and module is None:
+        return 11
+
+    if args.batch is not None:
+        if not all(os.path.exists(path) for path in args.batch):
+            return 11
+        if not all(os.access(path, os.R_OK) for path in Batch.inputs(args.batch)):
+            return 12
+        duplicate = Batch.duplicate(Batch.inputs(args.batch))
+        if duplicate is not None:
+            print(f"batch inputs {duplicate[0]} and {duplicate[1]} have the same name", file=sys.stderr)
+            return 10
 
-input_content = None
-lines = None
-if args.source_file is not None or args.input_file is not None:
     if args.source_file:
         if not os.path.isfile(args.source_file):
-            exit(11)
+            return 11
 
     if args.input_file is not None:
         if not os.path.isfile(args.input_file):
-            exit(11)
-        try:
-            input_content = open(args.input_file)
-        except Exception:
-            exit(12)
-        try:
-            lines = input_content.read().splitlines()
-        except EOFError:
-            lines = None
-            exit(11)
-
-else:
-    lines = None
-    exit(11)
-
-interpret = Interpreter(args.source_file, lines)
-interpret.main()
\ No newline at end of file
+            return 11
+        if not os.access(args.input_file, os.R_OK):
+            return 12
+
+    log_level = Log.levels[args.log_level] if args.log_level is not None else min(args.verbose, Log.DEBUG)
+    interpret = Interpreter(args.source_file, args.input_file, args.output_buffer, log_level, args.stats_file,
+                            args.stats_groups, cache, optimize=args.optimize, jit=args.jit, aot=args.aot, module=module)
+    if args.emit_python is not None:
+        return interpret.guarded(lambda: interpret.emit(args.emit_python))
+    if args.batch is not None:
+        return Batch(interpret, args.batch_output, args.jobs).run(args.batch)
+    return interpret.main()
+
+
+if __name__ == '__main__':
+    sys.modules.setdefault('interpret', sys.modules['__main__'])  # translated programs share these classes
+    sys.exit(main())